@@ -1,24 +1,56 @@
-from flask import Flask, render_template, redirect, url_for, flash, request
+from flask import Flask, Response, render_template, redirect, url_for, flash, request, jsonify, abort
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_wtf.csrf import CSRFProtect
 from config import Config
-from models import db, User, Transaction, Category
+from models import db, User, Transaction, Category, MonthlySummary
+from money import Money
 from forms import RegistrationForm, LoginForm
-from datetime import datetime
+from datetime import datetime, date
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from pagination import paginate_transactions
+from search import search_transactions
+from archive import month_start
+from commands import register_commands
+import rollups
+import data_version
+import bulk
+from cache import response_cache
+from http_cache import conditional
+from passwords import HashingPoolSaturated
+from user_cache import user_cache
+import passwords
+from sql_instrumentation import query_budget
+import sql_instrumentation
+import db_routing
+from assets import static_assets
+from metrics import request_metrics
+from profiler import request_profiler
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
+# First, so their hooks wrap everything the other extensions do in a request
+request_metrics.init_app(app)
+request_profiler.init_app(app)
 db.init_app(app)
+db_routing.init_app(app)
 csrf = CSRFProtect(app)
+sql_instrumentation.init_app(app)
+response_cache.init_app(app)
+passwords.init_app(app)
+user_cache.init_app(app)
+static_assets.init_app(app)
 
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+register_commands(app)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.get(int(user_id))
 
 
 @app.route('/')
@@ -55,6 +87,11 @@ def login():
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
         if user and user.check_password(form.password.data):
+            # Upgrade hashes made under an older hashing policy while we have the password
+            if user.password_needs_rehash():
+                user.set_password(form.password.data)
+                db.session.commit()
+
             login_user(user)
             flash('Login successful!', 'success')
             next_page = request.args.get('next')
@@ -73,14 +110,9 @@ def logout():
     return redirect(url_for('index'))
 
 
-@app.route('/dashboard')
-@login_required
-def dashboard():
-    filter_type = request.args.get('filter', 'all')
-    category_filter = request.args.get('category', 'all')
-
-    # Base query
-    query = Transaction.query.filter_by(user_id=current_user.id)
+def build_transaction_query(user_id, filter_type, category_filter):
+    """Build the user's transaction query with the dashboard's type and category filters applied"""
+    query = Transaction.query.filter_by(user_id=user_id).options(joinedload(Transaction.category))
 
     # Apply transaction type filter
     if filter_type == 'income':
@@ -92,25 +124,188 @@ def dashboard():
     if category_filter != 'all':
         query = query.filter_by(category_id=int(category_filter))
 
-    transactions = query.order_by(Transaction.date.desc()).all()
+    return query
+
+
+def get_transaction_page(filter_type, category_filter, search_text=''):
+    """Return (transactions, next_cursor) for the current request's filters, search and cursor"""
+    try:
+        query = build_transaction_query(current_user.id, filter_type, category_filter)
+        if search_text:
+            return search_transactions(query, search_text,
+                                       cursor=request.args.get('cursor'),
+                                       per_page=app.config['TRANSACTIONS_PER_PAGE'])
+        recent_months = app.config['DASHBOARD_RECENT_MONTHS']
+        return paginate_transactions(query,
+                                     cursor=request.args.get('cursor'),
+                                     per_page=app.config['TRANSACTIONS_PER_PAGE'],
+                                     recent_since=month_start(recent_months) if recent_months else None)
+    except ValueError:
+        abort(400)
+
+
+@app.route('/dashboard')
+@query_budget(6)
+@login_required
+@conditional
+@response_cache.cached
+def dashboard():
+    filter_type = request.args.get('filter', 'all')
+    category_filter = request.args.get('category', 'all')
+    search_text = request.args.get('q', '').strip()
 
-    total_income = sum(t.amount for t in Transaction.query.filter_by(user_id=current_user.id, transaction_type='income').all())
-    total_expenses = sum(t.amount for t in Transaction.query.filter_by(user_id=current_user.id, transaction_type='expense').all())
-    balance = total_income - total_expenses
+    transactions, next_cursor = get_transaction_page(filter_type, category_filter, search_text)
+
+    # From the monthly_summary rollup, which also covers archived transactions
+    total_income, total_expenses, balance = rollups.totals(current_user.id)
 
     # Get user's categories for the filter dropdown
     categories = Category.query.filter_by(user_id=current_user.id).order_by(Category.name).all()
 
     return render_template('dashboard.html',
                          transactions=transactions,
+                         next_cursor=next_cursor,
+                         is_first_page=not request.args.get('cursor'),
                          total_income=total_income,
                          total_expenses=total_expenses,
                          balance=balance,
                          filter_type=filter_type,
                          category_filter=category_filter,
+                         search_text=search_text,
                          categories=categories)
 
 
+def transaction_json(transaction, category=None):
+    """Serialize a transaction for the JSON API"""
+    category = category or transaction.category
+    return {
+        'id': transaction.id,
+        'category_id': category.id,
+        'category': category.name,
+        'description': transaction.description,
+        'transaction_type': transaction.transaction_type,
+        'amount': float(transaction.amount),
+        'date': transaction.date.strftime('%Y-%m-%d')
+    }
+
+
+def totals_json(user_id):
+    """The dashboard totals, read from the monthly_summary rollup instead of every transaction"""
+    total_income, total_expenses, balance = rollups.totals(user_id)
+    return {'income': float(total_income), 'expenses': float(total_expenses), 'balance': float(balance)}
+
+
+def api_error(message, status=400):
+    return jsonify({'error': message}), status
+
+
+def get_owned(model, id):
+    """Load one of the current user's rows by primary key, or None if it is missing or someone else's"""
+    row = db.session.get(model, id)
+    return row if row is not None and row.user_id == current_user.id else None
+
+
+def parse_transaction_json(data):
+    """Validate a JSON transaction body. Returns (column values, category) or raises ValueError"""
+    fields = ('category_id', 'description', 'transaction_type', 'amount', 'date')
+    if not isinstance(data, dict) or any(data.get(field) in (None, '') for field in fields):
+        raise ValueError('All fields are required.')
+    if data['transaction_type'] not in ('income', 'expense'):
+        raise ValueError('Type must be income or expense.')
+    # Checked here: PostgreSQL only rejects an over-long VARCHAR(200) at commit
+    if len(str(data['description'])) > 200:
+        raise ValueError('Description must be 200 characters or fewer.')
+    try:
+        amount = Money.parse(data['amount'])
+        category_id = int(data['category_id'])
+        transaction_date = datetime.strptime(data['date'], '%Y-%m-%d')
+    except (TypeError, ValueError):
+        raise ValueError('Amount, category or date is not valid.')
+    if amount <= Money(0):
+        raise ValueError('Amount must be greater than zero.')
+
+    category = get_owned(Category, category_id)
+    if category is None:
+        raise ValueError('Category not found.')
+
+    return {
+        'category_id': category.id,
+        'description': str(data['description']),
+        'transaction_type': data['transaction_type'],
+        'amount': amount,
+        'date': transaction_date
+    }, category
+
+
+@app.route('/api/transactions')
+@query_budget(3)
+@login_required
+def api_transactions():
+    """JSON feed of the user's transactions, optionally searched with q=, paginated with a next_cursor"""
+    filter_type = request.args.get('filter', 'all')
+    category_filter = request.args.get('category', 'all')
+    search_text = request.args.get('q', '').strip()
+
+    transactions, next_cursor = get_transaction_page(filter_type, category_filter, search_text)
+
+    return jsonify({
+        'transactions': [transaction_json(t) for t in transactions],
+        'next_cursor': next_cursor
+    })
+
+
+def month_range(since, until):
+    """List every 'YYYY-MM' from since to until inclusive"""
+    year, month = int(since[:4]), int(since[5:])
+    months = []
+    while f'{year:04d}-{month:02d}' <= until:
+        months.append(f'{year:04d}-{month:02d}')
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+@app.route('/reports')
+@query_budget(3)
+@login_required
+@conditional
+@response_cache.cached
+def reports():
+    months = min(max(request.args.get('months', 12, type=int), 1), 120)
+
+    today = date.today()
+    index = today.year * 12 + today.month - months
+    since = f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+    # Reads the monthly_summary rollup only: O(months x categories) rows
+    rows = rollups.report_rows(current_user.id, since)
+
+    until = max([today.strftime('%Y-%m')] + [row.year_month for row in rows])
+    month_labels = month_range(since, until)
+
+    trend = {month: {'income': Money(0), 'expense': Money(0)} for month in month_labels}
+    category_spend = {}
+    category_totals = {}
+    for row in rows:
+        # Rows of any other type, e.g. saved before types were validated, are not charted
+        if row.transaction_type not in trend[row.year_month]:
+            continue
+        trend[row.year_month][row.transaction_type] += row.total
+        if row.transaction_type == 'expense':
+            category_spend.setdefault(row.name, {})
+            category_spend[row.name][row.year_month] = category_spend[row.name].get(row.year_month, Money(0)) + row.total
+            category_totals[row.name] = category_totals.get(row.name, Money(0)) + row.total
+
+    top_categories = sorted(category_totals.items(), key=lambda item: item[1], reverse=True)[:5]
+
+    return render_template('reports.html',
+                         months=months,
+                         month_labels=month_labels,
+                         income_series=[float(trend[month]['income']) for month in month_labels],
+                         expense_series=[float(trend[month]['expense']) for month in month_labels],
+                         category_spend=sorted(category_spend.items()),
+                         top_categories=top_categories)
+
+
 @app.route('/transaction/add', methods=['POST'])
 @login_required
 def add_transaction():
@@ -131,17 +326,22 @@ def add_transaction():
     if not all([category_id, description, transaction_type, amount, date_str]):
         flash('All fields are required.', 'danger')
         return redirect(url_for('dashboard'))
+    if transaction_type not in ('income', 'expense'):
+        flash('Type must be income or expense.', 'danger')
+        return redirect(url_for('dashboard'))
 
     try:
         transaction = Transaction(
             user_id=current_user.id,
             category_id=int(category_id),
             description=description,
-            amount=float(amount),
+            amount=Money.parse(amount),
             transaction_type=transaction_type,
             date=datetime.strptime(date_str, '%Y-%m-%d')
         )
         db.session.add(transaction)
+        rollups.record_added(transaction)
+        data_version.bump(current_user.id)
         db.session.commit()
         flash('Transaction added successfully!', 'success')
     except Exception as e:
@@ -151,6 +351,70 @@ def add_transaction():
     return redirect(url_for('dashboard'))
 
 
+@app.route('/transactions/import', methods=['POST'])
+@login_required
+def import_transactions():
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('Please choose a CSV or OFX file to import.', 'danger')
+        return redirect(url_for('dashboard'))
+
+    # Deferred: only needed by this route and the CLI import command
+    from importer import detect_format, import_statement
+
+    try:
+        result = import_statement(current_user.id, upload.stream, detect_format(upload.filename))
+    except ValueError as e:
+        flash(f'Could not import file: {e}', 'danger')
+        return redirect(url_for('dashboard'))
+    except Exception:
+        flash('Error importing transactions. Please try again.', 'danger')
+        return redirect(url_for('dashboard'))
+
+    flash(f'Imported {result.imported} transaction(s).', 'success')
+    if result.created_categories:
+        flash(f"Created categories: {', '.join(result.created_categories)}.", 'info')
+    if result.error_count:
+        details = '; '.join(f'line {line_no}: {message}' for line_no, message in result.errors[:5])
+        more = f' (and {result.error_count - 5} more)' if result.error_count > 5 else ''
+        flash(f'Skipped {result.error_count} invalid row(s) - {details}{more}', 'warning')
+
+    return redirect(url_for('dashboard'))
+
+
+@app.route('/transactions/export')
+@login_required
+def export_transactions():
+    """Stream the user's transactions as CSV or NDJSON, honouring the dashboard filters and a date range"""
+    from exporter import FORMATS, export_statement, stream_rows
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in FORMATS:
+        abort(400)
+
+    try:
+        start_date = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end_date = date.fromisoformat(request.args['end']) if request.args.get('end') else None
+        statement = export_statement(current_user.id,
+                                     filter_type=request.args.get('filter', 'all'),
+                                     category_filter=request.args.get('category', 'all'),
+                                     start_date=start_date,
+                                     end_date=end_date)
+    except ValueError:
+        abort(400)
+
+    mimetype, extension, serialize = FORMATS[export_format]
+    engine = db_routing.read_engine(db)
+
+    # Give the request's connection back now; the stream checks out its own while it runs
+    db.session.close()
+
+    return Response(serialize(stream_rows(engine, statement)), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=transactions-{date.today().isoformat()}.{extension}',
+        'X-Accel-Buffering': 'no',
+    })
+
+
 @app.route('/transaction/edit/<int:id>', methods=['POST'])
 @login_required
 def edit_transaction(id):
@@ -171,13 +435,19 @@ def edit_transaction(id):
     if not all([category_id, description, transaction_type, amount, date_str]):
         flash('All fields are required.', 'danger')
         return redirect(url_for('dashboard'))
+    if transaction_type not in ('income', 'expense'):
+        flash('Type must be income or expense.', 'danger')
+        return redirect(url_for('dashboard'))
 
     try:
+        before = rollups.snapshot(transaction)
         transaction.category_id = int(category_id)
         transaction.description = description
-        transaction.amount = float(amount)
+        transaction.amount = Money.parse(amount)
         transaction.transaction_type = transaction_type
         transaction.date = datetime.strptime(date_str, '%Y-%m-%d')
+        rollups.record_changed(before, transaction)
+        data_version.bump(current_user.id)
         db.session.commit()
         flash('Transaction updated successfully!', 'success')
     except Exception as e:
@@ -196,26 +466,150 @@ def delete_transaction(id):
         flash('You do not have permission to delete this transaction.', 'danger')
         return redirect(url_for('dashboard'))
 
+    rollups.record_removed(transaction)
     db.session.delete(transaction)
+    data_version.bump(current_user.id)
     db.session.commit()
     flash('Transaction deleted successfully!', 'success')
     return redirect(url_for('dashboard'))
 
 
+# JSON mutation API used by the dashboard to update the page in place.
+# Each call touches the one changed row and its rollup rows; the totals come from the rollup.
+@app.route('/api/transactions', methods=['POST'])
+@query_budget(6)
+@login_required
+def api_add_transaction():
+    try:
+        values, category = parse_transaction_json(request.get_json(silent=True))
+    except ValueError as e:
+        return api_error(str(e))
+
+    transaction = Transaction(user_id=current_user.id, **values)
+    db.session.add(transaction)
+    rollups.record_added(transaction)
+    data_version.bump(current_user.id)
+    db.session.flush()
+
+    # Serialized before the commit expires the objects, so no reload is needed
+    payload = {'transaction': transaction_json(transaction, category), 'totals': totals_json(current_user.id)}
+    db.session.commit()
+    return jsonify(payload), 201
+
+
+@app.route('/api/transactions/<int:id>', methods=['PUT'])
+@query_budget(10)
+@login_required
+def api_edit_transaction(id):
+    transaction = get_owned(Transaction, id)
+    if transaction is None:
+        return api_error('Transaction not found.', 404)
+
+    try:
+        values, category = parse_transaction_json(request.get_json(silent=True))
+    except ValueError as e:
+        return api_error(str(e))
+
+    before = rollups.snapshot(transaction)
+    for column, value in values.items():
+        setattr(transaction, column, value)
+    rollups.record_changed(before, transaction)
+    data_version.bump(current_user.id)
+    db.session.flush()
+
+    payload = {'transaction': transaction_json(transaction, category), 'totals': totals_json(current_user.id)}
+    db.session.commit()
+    return jsonify(payload)
+
+
+@app.route('/api/transactions/<int:id>', methods=['DELETE'])
+@query_budget(7)
+@login_required
+def api_delete_transaction(id):
+    transaction = get_owned(Transaction, id)
+    if transaction is None:
+        return api_error('Transaction not found.', 404)
+
+    rollups.record_removed(transaction)
+    db.session.delete(transaction)
+    data_version.bump(current_user.id)
+    db.session.flush()
+
+    payload = {'id': id, 'totals': totals_json(current_user.id)}
+    db.session.commit()
+    return jsonify(payload)
+
+
+def parse_selection_json(data):
+    """Read a bulk selection: a list of transaction ids and/or an inclusive start/end date range"""
+    if not isinstance(data, dict):
+        raise ValueError('Select transactions or a date range.')
+    ids = data.get('ids') or None
+    # A string would iterate as its digits, and int() would accept floats, "12" and True
+    if ids is not None and not (isinstance(ids, list) and
+                                all(isinstance(i, int) and not isinstance(i, bool) for i in ids)):
+        raise ValueError('Selection ids must be a list of transaction ids.')
+    try:
+        start_date = date.fromisoformat(data['start']) if data.get('start') else None
+        end_date = date.fromisoformat(data['end']) if data.get('end') else None
+    except (TypeError, ValueError):
+        raise ValueError('Selection ids or dates are not valid.')
+    return ids, start_date, end_date
+
+
+@app.route('/api/transactions/bulk-delete', methods=['POST'])
+@query_budget(8)
+@login_required
+def api_bulk_delete_transactions():
+    """Delete the selected transactions, or all of them in a date range, with one DELETE"""
+    try:
+        ids, start_date, end_date = parse_selection_json(request.get_json(silent=True))
+        deleted = bulk.delete(current_user.id, ids, start_date, end_date)
+    except ValueError as e:
+        db.session.rollback()
+        return api_error(str(e))
+
+    payload = {'deleted': deleted, 'totals': totals_json(current_user.id)}
+    db.session.commit()
+    return jsonify(payload)
+
+
+@app.route('/api/transactions/bulk-retype', methods=['POST'])
+@query_budget(6)
+@login_required
+def api_bulk_retype_transactions():
+    """Set the type of the selected transactions, or all of them in a date range, with one UPDATE"""
+    data = request.get_json(silent=True)
+    try:
+        ids, start_date, end_date = parse_selection_json(data)
+        changed = bulk.retype(current_user.id, data.get('transaction_type'), ids, start_date, end_date)
+    except ValueError as e:
+        db.session.rollback()
+        return api_error(str(e))
+
+    payload = {'changed': changed, 'totals': totals_json(current_user.id)}
+    db.session.commit()
+    return jsonify(payload)
+
+
 # Category Management Routes
 @app.route('/categories')
+@query_budget(3)
 @login_required
+@conditional
+@response_cache.cached
 def manage_categories():
-    categories = Category.query.filter_by(user_id=current_user.id).order_by(Category.name).all()
-
-    # Get transaction count for each category
-    category_data = []
-    for category in categories:
-        transaction_count = Transaction.query.filter_by(category_id=category.id).count()
-        category_data.append({
-            'category': category,
-            'transaction_count': transaction_count
-        })
+    # Count each category's transactions, archived ones included, from the rollup
+    rows = db.session.query(Category, func.coalesce(func.sum(MonthlySummary.transaction_count), 0)).outerjoin(
+        MonthlySummary, (MonthlySummary.user_id == Category.user_id) & (MonthlySummary.category_id == Category.id)
+    ).filter(
+        Category.user_id == current_user.id
+    ).group_by(Category.id).order_by(Category.name).all()
+
+    category_data = [{
+        'category': category,
+        'transaction_count': transaction_count
+    } for category, transaction_count in rows]
 
     return render_template('categories.html', category_data=category_data)
 
@@ -246,6 +640,7 @@ def add_category():
             name=name
         )
         db.session.add(category)
+        data_version.bump(current_user.id)
         db.session.commit()
         flash('Category added successfully!', 'success')
     except Exception as e:
@@ -283,6 +678,7 @@ def edit_category(id):
 
     try:
         category.name = name
+        data_version.bump(current_user.id)
         db.session.commit()
         flash('Category updated successfully!', 'success')
     except Exception as e:
@@ -301,18 +697,160 @@ def delete_category(id):
         flash('You do not have permission to delete this category.', 'danger')
         return redirect(url_for('manage_categories'))
 
-    # Check if category has transactions
-    transaction_count = Transaction.query.filter_by(category_id=id).count()
+    # Check if category has transactions, archived ones included
+    transaction_count = db.session.query(func.coalesce(func.sum(MonthlySummary.transaction_count), 0)).filter(
+        MonthlySummary.user_id == current_user.id, MonthlySummary.category_id == id).scalar()
     if transaction_count > 0:
-        flash(f'Cannot delete category "{category.name}" - it has {transaction_count} transaction(s) linked to it. Please delete or reassign all transactions from this category first, then try again.', 'danger')
+        flash(f'Cannot delete category "{category.name}" - it has {transaction_count} transaction(s) linked to it. Use Move to move them to another category (or merge the two), then try again.', 'danger')
         return redirect(url_for('manage_categories'))
 
+    MonthlySummary.query.filter_by(category_id=id).delete()
     db.session.delete(category)
+    data_version.bump(current_user.id)
     db.session.commit()
     flash('Category deleted successfully!', 'success')
     return redirect(url_for('manage_categories'))
 
 
+def category_name_error(name, exclude_id=None):
+    """Validation message for a category name, or None when it is valid and not taken"""
+    if not isinstance(name, str) or not name.strip():
+        return 'Category name is required.'
+    if len(name) > 50:
+        return 'Category name must be 50 characters or fewer.'
+    existing = Category.query.filter_by(user_id=current_user.id, name=name)
+    if exclude_id is not None:
+        existing = existing.filter(Category.id != exclude_id)
+    if existing.first():
+        return f'Category "{name}" already exists.'
+    return None
+
+
+@app.route('/api/categories', methods=['POST'])
+@query_budget(4)
+@login_required
+def api_add_category():
+    data = request.get_json(silent=True)
+    name = data.get('name') if isinstance(data, dict) else None
+    error = category_name_error(name)
+    if error:
+        return api_error(error)
+
+    category = Category(user_id=current_user.id, name=name)
+    db.session.add(category)
+    data_version.bump(current_user.id)
+    db.session.flush()
+
+    payload = {'category': {'id': category.id, 'name': category.name, 'transaction_count': 0,
+                            'created_at': category.created_at.strftime('%Y-%m-%d')}}
+    db.session.commit()
+    return jsonify(payload), 201
+
+
+@app.route('/api/categories/<int:id>', methods=['PUT'])
+@query_budget(5)
+@login_required
+def api_edit_category(id):
+    category = get_owned(Category, id)
+    if category is None:
+        return api_error('Category not found.', 404)
+
+    data = request.get_json(silent=True)
+    name = data.get('name') if isinstance(data, dict) else None
+    error = category_name_error(name, exclude_id=id)
+    if error:
+        return api_error(error)
+
+    category.name = name
+    data_version.bump(current_user.id)
+    db.session.commit()
+    return jsonify({'category': {'id': id, 'name': name}})
+
+
+@app.route('/api/categories/<int:id>', methods=['DELETE'])
+@query_budget(7)
+@login_required
+def api_delete_category(id):
+    category = get_owned(Category, id)
+    if category is None:
+        return api_error('Category not found.', 404)
+
+    # An EXISTS probe on the rollup, which has a row for every month with live or archived transactions
+    if db.session.query(MonthlySummary.query.filter_by(user_id=current_user.id, category_id=id).exists()).scalar():
+        return api_error(f'Cannot delete category "{category.name}" while transactions are linked to it.', 409)
+
+    MonthlySummary.query.filter_by(category_id=id).delete()
+    db.session.delete(category)
+    data_version.bump(current_user.id)
+    db.session.commit()
+    return jsonify({'id': id})
+
+
+def bulk_category_target(id, field):
+    """The source and target categories of a reassign or merge request, or an error response"""
+    source = get_owned(Category, id)
+    if source is None:
+        return None, None, api_error('Category not found.', 404)
+    data = request.get_json(silent=True)
+    try:
+        target = get_owned(Category, int(data.get(field))) if isinstance(data, dict) else None
+    except (TypeError, ValueError):
+        target = None
+    if target is None:
+        return None, None, api_error('Choose one of your categories to move the transactions to.')
+    return source, target, None
+
+
+@app.route('/api/categories/<int:id>/reassign', methods=['POST'])
+@query_budget(8)
+@login_required
+def api_reassign_category(id):
+    """Move every transaction in a category to another category with one UPDATE"""
+    source, target, error = bulk_category_target(id, 'to_category_id')
+    if error:
+        return error
+
+    try:
+        moved = bulk.reassign(current_user.id, source.id, target.id)
+    except ValueError as e:
+        db.session.rollback()
+        return api_error(str(e))
+
+    payload = {'moved': moved, 'from_category_id': id, 'to_category_id': target.id}
+    db.session.commit()
+    return jsonify(payload)
+
+
+@app.route('/api/categories/<int:id>/merge', methods=['POST'])
+@query_budget(9)
+@login_required
+def api_merge_category(id):
+    """Move a category's transactions into another category and delete it"""
+    source, target, error = bulk_category_target(id, 'into_category_id')
+    if error:
+        return error
+
+    try:
+        moved = bulk.merge(current_user.id, source.id, target.id)
+    except ValueError as e:
+        db.session.rollback()
+        return api_error(str(e))
+
+    payload = {'moved': moved, 'deleted_category_id': id, 'into_category_id': target.id}
+    db.session.commit()
+    return jsonify(payload)
+
+
+@app.route('/api/cache/stats')
+@login_required
+def api_cache_stats():
+    """Hit/miss counters of this worker's page cache and user loader cache"""
+    return jsonify({
+        'pages': response_cache.stats(),
+        'user_loader': user_cache.stats()
+    })
+
+
 # Error Handlers
 @app.errorhandler(404)
 def page_not_found(e):
@@ -320,6 +858,12 @@ def page_not_found(e):
     return render_template('404.html'), 404
 
 
+@app.errorhandler(HashingPoolSaturated)
+def hashing_pool_saturated(e):
+    """Fail fast while the password hashing pool is full instead of queueing more work"""
+    return 'The server is busy, please try again in a moment.', 503, {'Retry-After': '1'}
+
+
 @app.errorhandler(500)
 def internal_server_error(e):
     """Handle 500 errors by rendering a custom error page"""
@@ -0,0 +1,95 @@
+"""Archiving of old transactions.
+
+archive_before() moves every transaction dated before a cutoff from the
+live transactions table into transactions_archive, one calendar month per
+database transaction, so an interrupted run leaves every row in exactly
+one of the two tables. The monthly_summary rollup is left alone: it
+already holds the per-month totals of the archived rows, which is what
+keeps dashboard balances and reports unchanged, and rollups.rebuild()
+reads both tables.
+
+The live table then only holds recent history, which keeps its indexes
+small. On a date-partitioned PostgreSQL table (see partitioning.py) the
+yearly partitions that the archive emptied are dropped.
+"""
+from datetime import date
+
+from sqlalchemy import text
+
+import partitioning
+
+COLUMNS = 'id, user_id, category_id, description, amount, transaction_type, date, created_at'
+
+
+def month_start(months_back, today=None):
+    """The first day of the month months_back calendar months before today's"""
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - months_back
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def pending_months(connection, cutoff):
+    """(first day, first day of the next month) for every month before cutoff with live transactions"""
+    oldest = connection.execute(text("SELECT MIN(date) FROM transactions")).scalar()
+    if oldest is None:
+        return []
+    if isinstance(oldest, str):
+        # SQLite hands dates back as text from a raw query
+        oldest = date.fromisoformat(oldest)
+
+    months = []
+    start = date(oldest.year, oldest.month, 1)
+    while start < cutoff:
+        months.append((start, min(_next_month(start), cutoff)))
+        start = _next_month(start)
+    return months
+
+
+def _move(connection, start, end):
+    params = {'start': start, 'end': end}
+    where = 'date >= :start AND date < :end'
+
+    # Pages and ETags of the affected users are keyed on their data version
+    connection.execute(text(
+        f"UPDATE users SET data_version = data_version + 1 "
+        f"WHERE id IN (SELECT DISTINCT user_id FROM transactions WHERE {where})"), params)
+
+    if connection.dialect.name == 'postgresql':
+        return connection.execute(text(f"""
+            WITH moved AS (DELETE FROM transactions WHERE {where} RETURNING {COLUMNS})
+            INSERT INTO transactions_archive ({COLUMNS}) SELECT {COLUMNS} FROM moved
+        """), params).rowcount
+
+    connection.execute(text(
+        f"INSERT INTO transactions_archive ({COLUMNS}) SELECT {COLUMNS} FROM transactions WHERE {where}"), params)
+    return connection.execute(text(f"DELETE FROM transactions WHERE {where}"), params).rowcount
+
+
+def archive_before(engine, cutoff, log=print):
+    """Move transactions dated before cutoff into transactions_archive; returns how many moved"""
+    with engine.connect() as connection:
+        months = pending_months(connection, cutoff)
+
+    moved = 0
+    for start, end in months:
+        with engine.begin() as connection:
+            count = _move(connection, start, end)
+        if count:
+            log(f"  {start:%Y-%m}: archived {count} transaction(s)")
+        moved += count
+
+    if engine.dialect.name == 'postgresql':
+        with engine.begin() as connection:
+            for name in partitioning.drop_empty_partitions(connection, before=cutoff):
+                log(f"  dropped empty partition {name}")
+    return moved
+
+
+def pending_count(connection, cutoff):
+    """How many live transactions archive_before(cutoff) would move"""
+    return connection.execute(
+        text("SELECT COUNT(*) FROM transactions WHERE date < :cutoff"), {'cutoff': cutoff}).scalar()
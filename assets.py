@@ -0,0 +1,181 @@
+"""Fingerprinted, minified and precompressed static assets.
+
+`build()` copies every file under static/ (except the build output itself)
+to static/dist/, minifying CSS on the way, and names each copy after a hash
+of its contents: css/style.css becomes dist/css/style.3f9a1c2b7d4e.css. Text
+assets also get .gz and, when the brotli package is installed, .br
+siblings. A manifest maps the source names to the hashed ones.
+
+The build is a deploy step (`flask assets build`), not part of startup.
+Files from earlier builds are kept: pages rendered before a deploy, and
+copies of them in a shared page cache, still link the old hashed names.
+A file whose hashed name already exists is identical and is not rewritten.
+
+With the manifest loaded, url_for('static', filename='css/style.css')
+resolves to the hashed file. Hashed files never change, so they are served
+with a one year immutable Cache-Control and the precompressed variant that
+matches the request's Accept-Encoding. Without a build (local development)
+static files are served unchanged.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # optional: only the gzip variants are written without it
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+# Tiny files are not worth an extra request header and a second file on disk
+MIN_COMPRESS_BYTES = 256
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE_AROUND = re.compile(r'\s*([{};,>])\s*')
+
+
+def minify_css(css):
+    """Drop comments and redundant whitespace. Keeps spaces inside values such as calc(a - b)"""
+    css = _CSS_COMMENT.sub('', css)
+    css = re.sub(r'\s+', ' ', css)
+    css = _CSS_SPACE_AROUND.sub(r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    css = css.replace(';}', '}')
+    return css.strip() + '\n'
+
+
+def hashed_name(filename, content):
+    """css/style.css -> css/style.<hash>.css"""
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    root, ext = os.path.splitext(filename)
+    return f'{root}.{digest}{ext}'
+
+
+def _source_files(static_folder):
+    for directory, subdirs, files in os.walk(static_folder):
+        if os.path.abspath(directory) == os.path.abspath(static_folder):
+            subdirs[:] = [d for d in subdirs if d != DIST_DIR]
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            yield os.path.relpath(path, static_folder).replace(os.sep, '/'), path
+
+
+def _write_atomic(path, content):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _write_compressed(path, content):
+    if len(content) < MIN_COMPRESS_BYTES:
+        return
+    # mtime=0 keeps the .gz byte-identical between builds
+    _write_atomic(path + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _write_atomic(path + '.br', brotli.compress(content, quality=11))
+
+
+def build(static_folder, log=None):
+    """Add the current source files to static/dist/ and write its manifest. Returns the manifest"""
+    dist = os.path.join(static_folder, DIST_DIR)
+    manifest = {}
+    for filename, path in _source_files(static_folder):
+        with open(path, 'rb') as f:
+            content = f.read()
+        if filename.endswith('.css'):
+            content = minify_css(content.decode('utf-8')).encode('utf-8')
+        target = hashed_name(filename, content)
+        target_path = os.path.join(dist, target)
+        manifest[filename] = f'{DIST_DIR}/{target}'
+        if os.path.isfile(target_path):
+            if log:
+                log(f'{filename} -> {manifest[filename]} (unchanged)')
+            continue
+
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        # Compressed variants first, so the file only appears once it can be served in full
+        if filename.endswith(COMPRESSIBLE_EXTENSIONS):
+            _write_compressed(target_path, content)
+        _write_atomic(target_path, content)
+        if log:
+            log(f'{filename} -> {manifest[filename]} ({len(content)} bytes)')
+
+    # Running instances may read the manifest while it is replaced
+    _write_atomic(os.path.join(dist, MANIFEST_NAME),
+                  json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+class StaticAssets:
+    """Resolves url_for('static') to hashed files and serves them"""
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.version = ''
+        self._hashed = frozenset()
+        self.static_folder = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.reload()
+        app.extensions['assets'] = self
+        app.url_defaults(self._hashed_url)
+        app.view_functions['static'] = self.serve
+
+    def reload(self):
+        """Pick up a manifest written by build() since the app started"""
+        self.set_manifest(load_manifest(self.static_folder))
+
+    def set_manifest(self, manifest):
+        self.manifest = manifest
+        self._hashed = frozenset(manifest.values())
+        # Changes whenever any asset does; pages embedding asset URLs include it in their cache keys
+        self.version = hashlib.sha1(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:HASH_LENGTH]
+
+    def build(self, log=None):
+        self.set_manifest(build(self.static_folder, log=log))
+        return self.manifest
+
+    def _hashed_url(self, endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = self.manifest.get(values['filename'], values['filename'])
+
+    def serve(self, filename):
+        if filename not in self._hashed:
+            return send_from_directory(self.static_folder, filename)
+
+        mimetype = mimetypes.guess_type(filename)[0]
+        accepted = request.accept_encodings
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if accepted[encoding] and os.path.isfile(os.path.join(self.static_folder, filename + suffix)):
+                response = send_from_directory(self.static_folder, filename + suffix, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(self.static_folder, filename, mimetype=mimetype)
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+static_assets = StaticAssets()
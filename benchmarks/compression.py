@@ -0,0 +1,104 @@
+"""Bytes saved against CPU time for each response compression setting.
+
+Seeds a temporary SQLite database, captures the dashboard, the JSON API and
+the streamed CSV export exactly as the app sends them (chunk by chunk), then
+replays each body through CompressionMiddleware at several gzip levels and
+brotli qualities and reports the compressed size and CPU milliseconds per
+response.
+
+    python -m benchmarks.compression [--transactions 20000] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = {
+    'dashboard': '/dashboard',
+    'api_transactions': '/api/transactions',
+    'export_csv': '/transactions/export?format=csv',
+}
+
+# (encoding, gzip level, brotli quality)
+SETTINGS = (
+    ('gzip', 1, None),
+    ('gzip', 6, None),
+    ('gzip', 9, None),
+    ('br', None, 1),
+    ('br', None, 4),
+    ('br', None, 6),
+    ('br', None, 11),
+)
+
+
+def capture(client, path):
+    """Return the response's content type and its body chunks as the app yields them"""
+    response = client.get(path, buffered=False)
+    assert response.status_code == 200, f'{path} returned {response.status_code}'
+    chunks = [chunk if isinstance(chunk, bytes) else chunk.encode() for chunk in response.response]
+    response.close()
+    return response.headers['Content-Type'], chunks
+
+
+def replay(content_type, chunks, encoding, level, quality):
+    """Send the chunks through CompressionMiddleware; return (compressed bytes, CPU seconds)"""
+    from compression import CompressionMiddleware
+
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', content_type)])
+        return chunks
+
+    middleware = CompressionMiddleware(app, level=level or 6, brotli_quality=quality or 4, min_size=0)
+    environ = {'REQUEST_METHOD': 'GET', 'HTTP_ACCEPT_ENCODING': encoding}
+    started = time.process_time()
+    size = sum(len(part) for part in middleware(environ, lambda status, headers, exc_info=None: None))
+    return size, time.process_time() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--transactions', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=20, help='compressions per setting, for stable CPU times')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ['RESPONSE_CACHE'] = 'none'
+        sys.path.insert(0, PROJECT_ROOT)
+
+        from app import app
+        from benchmarks.seed import BENCH_PASSWORD, bench_email, seed
+        from compression import brotli
+
+        with app.app_context():
+            seed(1, args.categories, args.transactions, log=lambda msg: None)
+        app.config['WTF_CSRF_ENABLED'] = False
+        client = app.test_client()
+        client.post('/login', data={'email': bench_email(0), 'password': BENCH_PASSWORD})
+        bodies = {name: capture(client, path) for name, path in PAGES.items()}
+
+    settings = [s for s in SETTINGS if s[0] == 'gzip' or brotli is not None]
+    if brotli is None:
+        print('brotli is not installed; showing gzip only')
+
+    print(f"{'response':<18} {'setting':<10} {'bytes':>10} {'saved':>7} {'cpu ms':>8} {'MB/s':>8}")
+    for name, (content_type, chunks) in bodies.items():
+        original = sum(len(chunk) for chunk in chunks)
+        print(f"{name:<18} {'identity':<10} {original:>10} {'':>7} {'':>8} {'':>8}   ({len(chunks)} chunks)")
+        for encoding, level, quality in settings:
+            cpu = 0.0
+            for _ in range(args.repeat):
+                size, seconds = replay(content_type, chunks, encoding, level, quality)
+                cpu += seconds
+            cpu /= args.repeat
+            label = f'{encoding}-{level or quality}'
+            throughput = original / cpu / 1e6 if cpu else float('inf')
+            print(f"{'':<18} {label:<10} {size:>10} {1 - size / original:>7.1%} {cpu * 1000:>8.2f} {throughput:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
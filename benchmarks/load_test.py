@@ -0,0 +1,196 @@
+"""HTTP load test of gunicorn at increasing worker counts.
+
+Starts gunicorn with gunicorn.conf.py for each worker count, logs in once,
+then hammers a page from concurrent client threads and reports throughput,
+latency and errors (non-200 responses and connection failures). With the
+default gthread workers, throughput should rise with the worker count up to
+the number of cores, with no connection errors.
+
+    python -m benchmarks.load_test [--workers 1 2 4] [--worker-class gthread] [--clients 16]
+
+A temporary SQLite database is used unless --database-url is given; pass a
+PostgreSQL URL to exercise the connection pool settings.
+"""
+import argparse
+import http.client
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EMAIL = 'loadtest@example.com'
+PASSWORD = 'loadtest-password'
+
+
+def seed(database_url, transactions=500):
+    """Create the schema and one user with a few categories and transactions"""
+    os.environ['DATABASE_URL'] = database_url
+    sys.path.insert(0, PROJECT_ROOT)
+    from app import app
+    from models import db, User, Category, Transaction
+    from money import Money
+    import migrations
+
+    with app.app_context():
+        migrations.init_schema(db.engine, log=lambda msg: None)
+        if User.query.filter_by(email=EMAIL).first():
+            return
+        user = User(username='loadtest', email=EMAIL)
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.flush()
+        categories = [Category(user_id=user.id, name=f'Category {i}') for i in range(10)]
+        db.session.add_all(categories)
+        db.session.flush()
+        db.session.execute(db.insert(Transaction), [{
+            'user_id': user.id,
+            'category_id': categories[i % 10].id,
+            'description': f'Load test {i}',
+            'amount': Money(100 * (1 + i % 100)),
+            'transaction_type': 'income' if i % 4 == 0 else 'expense',
+            'date': date.today() - timedelta(days=i % 365),
+        } for i in range(transactions)])
+        import rollups
+        rollups.rebuild(user.id)
+        db.session.commit()
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'gunicorn did not start listening on port {port}')
+
+
+def login(port):
+    """Log in over HTTP and return the session cookie header"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    conn.request('GET', '/login')
+    response = conn.getresponse()
+    body = response.read().decode()
+    cookie = response.getheader('Set-Cookie').split(';', 1)[0]
+    token = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', body) or \
+        re.search(r'name="csrf_token" value="([^"]+)"', body)
+
+    form = f'csrf_token={token.group(1)}&email={EMAIL}&password={PASSWORD}'
+    conn.request('POST', '/login', body=form, headers={
+        'Cookie': cookie, 'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    if response.status != 302:
+        raise RuntimeError(f'Login failed with status {response.status}')
+    return response.getheader('Set-Cookie').split(';', 1)[0]
+
+
+def hammer(port, path, cookie, clients, seconds):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local_latencies, local_errors = [], 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                conn.request('GET', path, headers={'Cookie': cookie})
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    local_errors += 1
+                if response.getheader('Connection', '').lower() == 'close':
+                    conn.close()
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                continue
+            local_latencies.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local_latencies)
+            errors.append(local_errors)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return latencies, sum(errors), elapsed
+
+
+def run(args, worker_count, database_url):
+    env = dict(os.environ,
+               DATABASE_URL=database_url,
+               PORT=str(args.port),
+               GUNICORN_WORKERS=str(worker_count),
+               GUNICORN_WORKER_CLASS=args.worker_class,
+               GUNICORN_THREADS=str(args.threads),
+               # Measure the real page work rather than the page cache
+               RESPONSE_CACHE='none')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                              cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(args.port)
+        cookie = login(args.port)
+        hammer(args.port, args.path, cookie, args.clients, 1)  # warm up every worker
+        latencies, errors, elapsed = hammer(args.port, args.path, cookie, args.clients, args.seconds)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+    return {
+        'workers': worker_count,
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+        'p95_ms': p95 * 1000,
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, nargs='*', help='worker counts to compare (default: 1, 2, ... CPUs)')
+    parser.add_argument('--worker-class', default='gthread', choices=('sync', 'gthread', 'gevent'))
+    parser.add_argument('--threads', type=int, default=4, help='threads per gthread worker')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent client threads')
+    parser.add_argument('--seconds', type=float, default=10, help='measuring time per worker count')
+    parser.add_argument('--path', default='/dashboard', help='page to request')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--database-url', help='database to test against (default: temporary SQLite file)')
+    args = parser.parse_args()
+
+    from concurrency import cpu_count
+    worker_counts = args.workers or sorted({1, 2, max(cpu_count() // 2, 1), cpu_count()})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'loadtest.db')}"
+        seed(database_url)
+
+        print(f"{args.worker_class} workers, {args.threads} threads each, {args.clients} clients, "
+              f"GET {args.path} for {args.seconds:g}s")
+        print(f"{'workers':>7} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+        for worker_count in worker_counts:
+            result = run(args, worker_count, database_url)
+            print(f"{result['workers']:>7} {result['requests']:>9} {result['rps']:>8.1f} "
+                  f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
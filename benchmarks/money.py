@@ -0,0 +1,168 @@
+"""Float amounts against integer pence: aggregation speed, storage and exactness.
+
+Fills two copies of a transactions-shaped table with the same random
+amounts, one in a FLOAT (double precision) column as the app used to store
+them and one in BIGINT pence as MoneyType does. It then times the app's two
+aggregates on each, the dashboard totals for one user and the rollup
+rebuild GROUP BY, reports the size of each table, and counts the sums
+where the float SUM is not the exact amount.
+
+Uses a temporary SQLite database, or --database-url for a local PostgreSQL
+(the tables are created and dropped there).
+
+    python -m benchmarks.money [--rows 500000] [--users 20] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import BigInteger, Column, Date, Float, Index, Integer, MetaData, String, Table, create_engine, text
+from sqlalchemy.exc import DBAPIError
+
+BATCH_SIZE = 10000
+
+VARIANTS = {
+    'float': Float(precision=53),
+    'pence': BigInteger(),
+}
+
+
+def define_tables():
+    metadata = MetaData()
+    tables = {}
+    for name, amount_type in VARIANTS.items():
+        tables[name] = Table(
+            f'bench_amount_{name}', metadata,
+            Column('id', Integer, primary_key=True),
+            Column('user_id', Integer, nullable=False),
+            Column('category_id', Integer, nullable=False),
+            Column('transaction_type', String(10), nullable=False),
+            Column('date', Date, nullable=False),
+            Column('amount', amount_type, nullable=False),
+            Index(f'ix_bench_amount_{name}_user', 'user_id', 'date'),
+        )
+    return metadata, tables
+
+
+def fill(engine, tables, rows, users, seed_value=42):
+    rng = random.Random(seed_value)
+    today = date.today()
+    batch = []
+    with engine.begin() as connection:
+        for i in range(rows):
+            is_income = rng.random() < 0.2
+            batch.append({
+                'user_id': rng.randrange(users),
+                'category_id': rng.randrange(20),
+                'transaction_type': 'income' if is_income else 'expense',
+                'date': today - timedelta(days=rng.randrange(3 * 365)),
+                'pence': rng.randint(50000, 300000) if is_income else rng.randint(1, 25000),
+            })
+            if len(batch) >= BATCH_SIZE or i == rows - 1:
+                for name, table in tables.items():
+                    connection.execute(table.insert(), [{
+                        'user_id': row['user_id'], 'category_id': row['category_id'],
+                        'transaction_type': row['transaction_type'], 'date': row['date'],
+                        'amount': row['pence'] / 100 if name == 'float' else row['pence'],
+                    } for row in batch])
+                batch = []
+
+
+def queries(table_name, dialect_name):
+    """label -> (SQL, number of SUM columns at the end of each row)"""
+    month = "to_char(date, 'YYYY-MM')" if dialect_name == 'postgresql' else "strftime('%Y-%m', date)"
+    return {
+        'dashboard totals': (
+            f"SELECT SUM(CASE WHEN transaction_type = 'income' THEN amount ELSE 0 END), "
+            f"SUM(CASE WHEN transaction_type = 'expense' THEN amount ELSE 0 END) "
+            f"FROM {table_name} WHERE user_id = 0", 2),
+        'rollup rebuild': (
+            f"SELECT user_id, category_id, {month}, transaction_type, SUM(amount) "
+            f"FROM {table_name} GROUP BY user_id, category_id, {month}, transaction_type "
+            f"ORDER BY 1, 2, 3, 4", 1),
+    }
+
+
+def time_query(connection, sql, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = connection.execute(text(sql)).all()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def table_size(connection, table_name):
+    """Bytes used by the table and its indexes, or None if the database cannot tell"""
+    if connection.dialect.name == 'postgresql':
+        return connection.execute(text(f"SELECT pg_total_relation_size('{table_name}')")).scalar()
+    try:
+        return connection.execute(text("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE :name"),
+                                  {'name': f'%{table_name}%'}).scalar()
+    except DBAPIError:
+        # SQLite built without the dbstat table
+        return None
+
+
+def inexact_sums(float_rows, pence_rows, sum_columns):
+    """How many float SUMs differ from the exact pence totals, and the largest difference in pence"""
+    wrong, worst = 0, 0.0
+    for float_row, pence_row in zip(float_rows, pence_rows):
+        for float_total, pence_total in zip(float_row[-sum_columns:], pence_row[-sum_columns:]):
+            if float(float_total) != int(pence_total) / 100:
+                wrong += 1
+                worst = max(worst, abs(float(float_total) * 100 - int(pence_total)))
+    return wrong, worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5, help='runs per query; the median is reported')
+    parser.add_argument('--database-url', help='database to create the tables in (default: temporary SQLite file)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        metadata, tables = define_tables()
+        metadata.drop_all(engine)
+        metadata.create_all(engine)
+        try:
+            started = time.perf_counter()
+            fill(engine, tables, args.rows, args.users)
+            print(f'Inserted {args.rows} rows into each table in {time.perf_counter() - started:.1f}s')
+
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                for table in tables.values():
+                    connection.execute(text(f'VACUUM ANALYZE {table.name}' if engine.dialect.name == 'postgresql'
+                                            else f'ANALYZE {table.name}'))
+
+                print(f"{'query':<18} {'float ms':>10} {'pence ms':>10} {'inexact sums':>14} {'worst (pence)':>14}")
+                for label in ('dashboard totals', 'rollup rebuild'):
+                    timings, results = {}, {}
+                    for name, table in tables.items():
+                        sql, sum_columns = queries(table.name, engine.dialect.name)[label]
+                        timings[name], results[name] = time_query(connection, sql, args.repeat)
+                    wrong, worst = inexact_sums(results['float'], results['pence'], sum_columns)
+                    counted = f"{wrong}/{len(results['pence']) * sum_columns}"
+                    print(f"{label:<18} {timings['float'] * 1000:>10.2f} {timings['pence'] * 1000:>10.2f} "
+                          f"{counted:>14} {worst:>14.2e}")
+
+                sizes = {name: table_size(connection, table.name) for name, table in tables.items()}
+                if None in sizes.values():
+                    print('Table sizes are not available (SQLite without the dbstat table)')
+                else:
+                    print(f"table size: float {sizes['float'] / 1e6:.2f} MB, pence {sizes['pence'] / 1e6:.2f} MB "
+                          f"({1 - sizes['pence'] / sizes['float']:.1%} smaller)")
+        finally:
+            metadata.drop_all(engine)
+            engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
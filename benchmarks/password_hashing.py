@@ -0,0 +1,69 @@
+"""Logins per second at each password hashing cost setting.
+
+For every method the benchmark verifies a correct password repeatedly, once
+inline on a single thread and once through the process pool with several
+concurrent callers, and reports verifications (i.e. logins) per second.
+
+    python -m benchmarks.password_hashing [--seconds 3] [--workers 4] [--clients 8]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import passwords
+
+METHODS = (
+    'pbkdf2:sha256:100000',
+    'pbkdf2:sha256:600000',
+    'pbkdf2:sha256:1000000',
+    'scrypt:16384:8:1',
+    'scrypt:32768:8:1',
+    'scrypt:65536:8:1',
+)
+
+
+def measure(seconds, clients, password_hash):
+    """Run verify_password from `clients` threads for `seconds`; return verifications per second"""
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        count = 0
+        while time.perf_counter() < deadline:
+            assert passwords.verify_password(password_hash, 'correct horse')
+            count += 1
+        return count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        total = sum(executor.map(lambda _: client(), range(clients)))
+    return total / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seconds', type=float, default=3.0, help='measuring time per setting')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='hashing pool size')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent callers for the pool run')
+    parser.add_argument('--methods', nargs='*', default=METHODS, help='werkzeug methods to compare')
+    args = parser.parse_args()
+
+    print(f"{'method':<24} {'hash ms':>8} {'inline/s':>10} {'pool/s':>10}   (pool: {args.workers} workers, "
+          f"{args.clients} clients)")
+    for method in args.methods:
+        passwords.configure(method=method, workers=0)
+        started = time.perf_counter()
+        password_hash = passwords.hash_password('correct horse')
+        hash_ms = (time.perf_counter() - started) * 1000
+        inline = measure(args.seconds, 1, password_hash)
+
+        passwords.configure(method=method, workers=args.workers, queue_limit=args.clients * 2, timeout=60)
+        passwords.verify_password(password_hash, 'correct horse')  # start the pool outside the timing
+        pooled = measure(args.seconds, args.clients, password_hash)
+        passwords.shutdown()
+
+        print(f"{method:<24} {hash_ms:>8.1f} {inline:>10.1f} {pooled:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+"""Route-level benchmark with a seeded population and baseline comparison.
+
+Seeds a fresh database (SQLite by default, or --database-url for a local
+PostgreSQL), then requests each route repeatedly through the Flask test
+client or a local gunicorn (--gunicorn) and reports per-route p50/p95/p99
+latency, throughput and SQL queries per request. Results are written as
+JSON; with --baseline they are compared against a stored run and the
+process exits non-zero when a route regresses beyond the thresholds.
+
+    python -m benchmarks.routes --transactions 50000 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.routes --transactions 50000 --baseline benchmarks/baseline.json
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from urllib.parse import urlencode
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (method, path, form data or None, expected status)
+ROUTES = {
+    'dashboard': ('GET', '/dashboard', None, 200),
+    'dashboard_filtered': ('GET', '/dashboard?filter=expense&category={category_id}', None, 200),
+    'api_transactions': ('GET', '/api/transactions', None, 200),
+    'manage_categories': ('GET', '/categories', None, 200),
+    'reports': ('GET', '/reports', None, 200),
+    'add_transaction': ('POST', '/transaction/add', {
+        'category_id': '{category_id}', 'description': 'Benchmark', 'transaction_type': 'expense',
+        'amount': '9.99', 'date': date.today().isoformat()}, 302),
+    'login': ('POST', '/login', {'email': '{email}', 'password': '{password}'}, 302),
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarise(latencies, queries, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else 0.0,
+    }
+
+
+class TestClientDriver:
+    """Runs requests in-process; queries are counted by sql_instrumentation"""
+
+    def __init__(self, app):
+        self.app = app
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+
+    def login(self, email, password):
+        response = self.client.post('/login', data={'email': email, 'password': password})
+        assert response.status_code == 302, 'benchmark login failed'
+
+    def request(self, method, path, data, fresh_session=False):
+        from sql_instrumentation import count_queries
+        client = self.app.test_client() if fresh_session else self.client
+        with count_queries() as stats:
+            started = time.perf_counter()
+            response = client.open(path, method=method, data=data)
+            elapsed = time.perf_counter() - started
+        return response.status_code, elapsed, stats.count
+
+    def close(self):
+        pass
+
+
+class GunicornDriver:
+    """Runs requests over HTTP against a local gunicorn; queries are read from Server-Timing"""
+
+    def __init__(self, database_url, port, workers):
+        from benchmarks.load_test import wait_for_port
+        env = dict(os.environ, DATABASE_URL=database_url, PORT=str(port), GUNICORN_WORKERS=str(workers),
+                   RESPONSE_CACHE='none')
+        self.port = port
+        self.server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                                       cwd=PROJECT_ROOT, env=env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wait_for_port(port)
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        self.cookie = None
+
+    def _send(self, conn, method, path, data, cookie):
+        headers = {'Cookie': cookie} if cookie else {}
+        body = None
+        if data is not None:
+            # Every form needs a CSRF token from a page rendered for this session
+            conn.request('GET', '/login' if path == '/login' else '/dashboard', headers=headers)
+            response = conn.getresponse()
+            page = response.read().decode()
+            cookie = self._cookie(response) or cookie
+            headers = {'Cookie': cookie} if cookie else {}
+            token = re.search(r'name="csrf_token"[^>]*value="([^"]+)"', page)
+            data = dict(data, csrf_token=token.group(1))
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        started = time.perf_counter()
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        elapsed = time.perf_counter() - started
+
+        timing = re.search(r'db;desc="(\d+) queries"', response.getheader('Server-Timing', ''))
+        return response, elapsed, int(timing.group(1)) if timing else 0, self._cookie(response) or cookie
+
+    @staticmethod
+    def _cookie(response):
+        header = response.getheader('Set-Cookie')
+        return header.split(';', 1)[0] if header else None
+
+    def login(self, email, password):
+        response, _, _, self.cookie = self._send(self.conn, 'POST', '/login',
+                                                 {'email': email, 'password': password}, None)
+        assert response.status == 302, 'benchmark login failed'
+
+    def request(self, method, path, data, fresh_session=False):
+        if fresh_session:
+            conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+            response, elapsed, queries, _ = self._send(conn, method, path, data, None)
+            conn.close()
+        else:
+            response, elapsed, queries, self.cookie = self._send(self.conn, method, path, data, self.cookie)
+        return response.status, elapsed, queries
+
+    def close(self):
+        self.server.terminate()
+        self.server.wait(timeout=30)
+
+
+def run_routes(driver, routes, requests, context):
+    results = {}
+    for name in routes:
+        method, path, data, expected = ROUTES[name]
+        path = path.format(**context)
+        data = {k: v.format(**context) for k, v in data.items()} if data else None
+
+        driver.request(method, path, data, fresh_session=(name == 'login'))  # warm up
+        latencies, queries = [], []
+        started = time.perf_counter()
+        for _ in range(requests):
+            status, elapsed, count = driver.request(method, path, data, fresh_session=(name == 'login'))
+            if status != expected:
+                raise RuntimeError(f'{name}: expected HTTP {expected}, got {status}')
+            latencies.append(elapsed)
+            queries.append(count)
+        results[name] = summarise(latencies, queries, time.perf_counter() - started)
+    return results
+
+
+def compare(results, baseline, latency_threshold, query_threshold):
+    """Return a list of regression descriptions for routes present in both runs"""
+    regressions = []
+    for name, current in results['routes'].items():
+        previous = baseline.get('routes', {}).get(name)
+        if previous is None:
+            continue
+        # p99 is reported but too noisy at benchmark sample sizes to gate on
+        for metric in ('p50_ms', 'p95_ms'):
+            limit = previous[metric] * (1 + latency_threshold)
+            if current[metric] > limit:
+                regressions.append(f'{name}: {metric} {current[metric]:.2f} > {limit:.2f} '
+                                   f'(baseline {previous[metric]:.2f} + {latency_threshold:.0%})')
+        if current['queries_per_request'] > previous['queries_per_request'] + query_threshold:
+            regressions.append(f"{name}: queries/request {current['queries_per_request']} > "
+                               f"baseline {previous['queries_per_request']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--transactions', type=int, default=10000, help='transactions per user')
+    parser.add_argument('--requests', type=int, default=100, help='timed requests per route')
+    parser.add_argument('--routes', nargs='*', default=list(ROUTES), choices=list(ROUTES))
+    parser.add_argument('--database-url', help='empty database to seed (default: temporary SQLite file)')
+    parser.add_argument('--gunicorn', action='store_true', help='drive a local gunicorn instead of the test client')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn workers (with --gunicorn)')
+    parser.add_argument('--port', type=int, default=8767)
+    parser.add_argument('--output', default='bench_results.json', help='where to write the results JSON')
+    parser.add_argument('--baseline', help='results JSON to compare against')
+    parser.add_argument('--save-baseline', help='also write the results to this baseline path')
+    parser.add_argument('--latency-threshold', type=float, default=0.25,
+                        help='allowed fractional latency increase over the baseline')
+    parser.add_argument('--query-threshold', type=float, default=0,
+                        help='allowed increase in queries per request over the baseline')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ['DATABASE_URL'] = database_url
+        os.environ['RESPONSE_CACHE'] = 'none'
+        sys.path.insert(0, PROJECT_ROOT)
+
+        from app import app
+        from benchmarks.seed import BENCH_PASSWORD, bench_email, seed
+        from models import Category
+
+        started = time.perf_counter()
+        with app.app_context():
+            user_ids = seed(args.users, args.categories, args.transactions, log=lambda msg: None)
+            category_id = Category.query.filter_by(user_id=user_ids[0]).first().id
+        print(f'Seeded {args.users} users x {args.categories} categories x {args.transactions} transactions '
+              f'in {time.perf_counter() - started:.1f}s')
+
+        context = {'category_id': category_id, 'email': bench_email(0), 'password': BENCH_PASSWORD}
+        driver = GunicornDriver(database_url, args.port, args.workers) if args.gunicorn else TestClientDriver(app)
+        try:
+            driver.login(context['email'], context['password'])
+            route_results = run_routes(driver, args.routes, args.requests, context)
+        finally:
+            driver.close()
+
+    results = {
+        'config': {
+            'users': args.users, 'categories': args.categories, 'transactions': args.transactions,
+            'requests': args.requests, 'driver': 'gunicorn' if args.gunicorn else 'test_client',
+            'database': database_url.split(':', 1)[0], 'python': platform.python_version(),
+        },
+        'routes': route_results,
+    }
+
+    print(f"{'route':<20} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'queries':>8}")
+    for name, r in route_results.items():
+        print(f"{name:<20} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+              f"{r['throughput_rps']:>9.1f} {r['queries_per_request']:>8.1f}")
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f'Wrote {path}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('config', {}).get('transactions') != args.transactions:
+            print('Warning: baseline was recorded with a different population size')
+        regressions = compare(results, baseline, args.latency_threshold, args.query_threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print('No regressions against the baseline.')
+
+
+if __name__ == '__main__':
+    main()
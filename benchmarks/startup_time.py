@@ -0,0 +1,73 @@
+"""Time from process start to the first request served.
+
+Starts gunicorn (one worker, as a deploy or worker restart would) against a
+database whose schema is already current, polls until the first request
+succeeds, and reports the elapsed time over several runs. The first run
+against a new database, which has to create the schema, is reported
+separately.
+
+    python -m benchmarks.startup_time [--runs 5] [--database-url URL]
+"""
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_to_first_request(database_url, port, timeout=60):
+    env = dict(os.environ, DATABASE_URL=database_url, PORT=str(port), GUNICORN_WORKERS='1')
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                              cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+                conn.request('GET', '/')
+                if conn.getresponse().status == 200:
+                    return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError('gunicorn did not serve a request in time')
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def time_import():
+    """Seconds to import the app in a fresh interpreter; unlike wsgi, importing it does not touch the database"""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'import app'], cwd=PROJECT_ROOT, check=True,
+                   env=dict(os.environ, DATABASE_URL='sqlite://'))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--database-url', help='existing database to boot against (default: temporary SQLite file)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'startup.db')}"
+
+        first = time_to_first_request(database_url, args.port)
+        runs = [time_to_first_request(database_url, args.port) for _ in range(args.runs)]
+        imports = [time_import() for _ in range(args.runs)]
+
+    label = 'first boot' if not args.database_url else 'first run'
+    print(f"{label + ' (creates schema if needed)':<40} {first * 1000:8.0f} ms")
+    print(f"{'boot with current schema, median':<40} {statistics.median(runs) * 1000:8.0f} ms "
+          f"(min {min(runs) * 1000:.0f}, max {max(runs) * 1000:.0f})")
+    print(f"{'import app in a new interpreter, median':<40} {statistics.median(imports) * 1000:8.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Set-based bulk operations on a user's transactions and categories.
+
+Each operation is a single UPDATE or DELETE per table whose WHERE clause
+carries the ownership checks (the transactions' user_id, and that a target
+category belongs to the same user), so no ORM objects are loaded row by row
+and a foreign id can never be touched. Category moves and deletes also cover
+archived transactions; retypes only apply to live ones.
+
+The monthly_summary rollup is updated with grouped deltas, so the cost
+follows the size of the selection rather than the user's whole history:
+deletes and retypes aggregate just the selected rows before changing them,
+and category moves shift the category's own rollup rows. The user's data
+version is then bumped. Callers commit, so the whole operation is one
+transaction.
+"""
+from sqlalchemy import and_, exists
+from sqlalchemy.orm import aliased
+
+from models import db, ArchivedTransaction, Category, Transaction
+import data_version
+import rollups
+
+# Upper bound on ids in one selection, to keep the IN (...) list reasonable
+MAX_SELECTION = 1000
+
+
+def _owns_category(user_id, category_id):
+    # Aliased so it never correlates with an outer statement on categories
+    target = aliased(Category)
+    return exists().where(target.id == category_id, target.user_id == user_id)
+
+
+def _finish(user_id):
+    rollups.prune(user_id)
+    data_version.bump(user_id)
+
+
+def _execute(statement):
+    return db.session.execute(statement, execution_options={'synchronize_session': False}).rowcount
+
+
+def _selection(user_id, ids=None, start_date=None, end_date=None, model=Transaction):
+    """WHERE conditions for the user's transactions (or archived ones) picked by id list and/or date range"""
+    if not ids and start_date is None and end_date is None:
+        raise ValueError('Select transactions or a date range.')
+    if ids and len(ids) > MAX_SELECTION:
+        raise ValueError(f'Select at most {MAX_SELECTION} transactions at a time.')
+
+    conditions = [model.user_id == user_id]
+    if ids:
+        conditions.append(model.id.in_(ids))
+    if start_date is not None:
+        conditions.append(model.date >= start_date)
+    if end_date is not None:
+        conditions.append(model.date <= end_date)
+    return conditions
+
+
+def _move_transactions(user_id, from_category_id, to_category_id):
+    if from_category_id == to_category_id:
+        raise ValueError('Choose a different category to move the transactions to.')
+    moved = 0
+    for model in (Transaction, ArchivedTransaction):
+        moved += _execute(db.update(model).where(
+            model.user_id == user_id,
+            model.category_id == from_category_id,
+            _owns_category(user_id, to_category_id),
+        ).values(category_id=to_category_id))
+    # Nothing moved when the target is not the user's, and then the rollup must not move either
+    if moved:
+        rollups.move_category(user_id, from_category_id, to_category_id)
+    return moved
+
+
+def reassign(user_id, from_category_id, to_category_id):
+    """Move every transaction in one of the user's categories, archived ones included, to another of their categories"""
+    moved = _move_transactions(user_id, from_category_id, to_category_id)
+    if moved:
+        data_version.bump(user_id)
+    return moved
+
+
+def merge(user_id, from_category_id, into_category_id):
+    """Reassign a category's transactions to another category and delete it. Returns the rows moved"""
+    # The category's rollup rows move with its transactions, so none are left pointing at it
+    moved = _move_transactions(user_id, from_category_id, into_category_id)
+    # Only goes ahead once the category is empty, i.e. the target was valid and everything moved
+    deleted = _execute(db.delete(Category).where(
+        Category.id == from_category_id,
+        Category.user_id == user_id,
+        _owns_category(user_id, into_category_id),
+        ~exists().where(Transaction.category_id == from_category_id),
+        ~exists().where(ArchivedTransaction.category_id == from_category_id),
+    ))
+    if not deleted:
+        raise ValueError('Category could not be merged.')
+    # Even when nothing moved, the category list changed
+    data_version.bump(user_id)
+    return moved
+
+
+def delete(user_id, ids=None, start_date=None, end_date=None):
+    """Delete the user's transactions, archived ones included, picked by ids and/or an inclusive date range"""
+    deleted = 0
+    # Archived rows still count in the rollup, so a range reaching back past the cutoff must remove them too
+    for model in (Transaction, ArchivedTransaction):
+        selection = _selection(user_id, ids, start_date, end_date, model)
+        rollups.record_bulk_change(model, selection)
+        deleted += _execute(db.delete(model).where(*selection))
+    _finish(user_id)
+    return deleted
+
+
+def retype(user_id, transaction_type, ids=None, start_date=None, end_date=None):
+    """Set the income/expense type of the user's selected transactions"""
+    if transaction_type not in ('income', 'expense'):
+        raise ValueError('Type must be income or expense.')
+    selection = _selection(user_id, ids, start_date, end_date)
+    rollups.record_bulk_change(Transaction, selection, transaction_type=transaction_type)
+    changed = _execute(db.update(Transaction).where(
+        and_(*selection),
+        Transaction.transaction_type != transaction_type,
+    ).values(transaction_type=transaction_type))
+    _finish(user_id)
+    return changed
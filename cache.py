@@ -0,0 +1,189 @@
+"""Per-user response cache for read-only pages.
+
+Rendered pages are stored under a key made of the user id, the user's data
+version (see data_version.py), the endpoint and its query arguments. Any
+mutation bumps the version, so stale entries are simply never looked up
+again and age out of the backend.
+
+Backends implement the small CacheBackend interface. LRUBackend keeps
+entries in process memory; SharedBackend wraps any client with
+get/set/delete (redis-py compatible) so several gunicorn workers can share
+entries. A dict-backed stand-in is enough to implement it in tests.
+"""
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+
+import data_version
+
+
+def csrf_epoch():
+    """Changes every half CSRF token lifetime, so no cached page or 304 outlives the token it embeds"""
+    time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    if not time_limit:
+        return ''
+    return str(int(time.time()) // max(time_limit // 2, 1))
+
+
+def page_fingerprint():
+    """Identify the current page's content: user, data version, endpoint, query args, session and CSRF epoch"""
+    args = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    # Pages embed a CSRF token bound to the session, so pages are not shared between sessions
+    session_token = hashlib.sha1(str(session.get('csrf_token', '')).encode()).hexdigest()[:12]
+    # Pages link hashed static asset names, so a new asset build changes every page
+    assets = current_app.extensions.get('assets')
+    asset_version = assets.version if assets is not None else ''
+    user_id = current_user.id
+    return (f'{user_id}:{data_version.current(user_id)}:{request.endpoint}:{args}:{session_token}:'
+            f'{asset_version}:{csrf_epoch()}')
+
+
+class CacheBackend:
+    """Storage interface used by ResponseCache"""
+
+    def get(self, key):
+        """Return the stored value, or None if it is missing or expired"""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        """Store value for ttl seconds"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class LRUBackend(CacheBackend):
+    """In-process cache bounded by entry count, evicting the least recently used entry first"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedBackend(CacheBackend):
+    """Cache shared between processes through a client with get(key), set(key, value, ex=ttl) and delete(key)"""
+
+    def __init__(self, client, prefix='finance:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(int(ttl), 1))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        # Entries become unreachable through the data version and expire by TTL
+        pass
+
+
+class ResponseCache:
+    def __init__(self, backend=None, ttl=300):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = backend is not None
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure the backend from RESPONSE_CACHE ('lru', 'shared' or 'none')"""
+        kind = app.config.get('RESPONSE_CACHE', 'lru')
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', 300)
+
+        if kind == 'lru':
+            self.backend = LRUBackend(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+        elif kind == 'shared':
+            # Optional dependency, only needed for a shared cache
+            import redis
+            self.backend = SharedBackend(redis.Redis.from_url(app.config['RESPONSE_CACHE_URL']))
+        elif kind != 'none':
+            raise ValueError(f'Unknown RESPONSE_CACHE backend {kind!r}')
+
+        self.enabled = self.backend is not None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'entries': len(self.backend) if hasattr(self.backend, '__len__') else None,
+        }
+
+    def cached(self, view):
+        """Serve a login-protected GET view from the cache while the user's data is unchanged"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Pages showing flashed messages are one-off and must not be replayed
+            if not self.enabled or request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            key = 'page:' + page_fingerprint()
+            entry = self.backend.get(key)
+            if entry is not None:
+                with self._counter_lock:
+                    self.hits += 1
+                body, mimetype = entry
+                response = make_response(body)
+                response.mimetype = mimetype
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            with self._counter_lock:
+                self.misses += 1
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough and not session.get('_flashes'):
+                self.backend.set(key, (response.get_data(), response.mimetype), self.ttl)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+
+
+response_cache = ResponseCache()
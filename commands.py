@@ -0,0 +1,172 @@
+"""Flask CLI commands, available as `flask --app app <command>`."""
+import sys
+
+import click
+
+from models import db
+
+
+def register_commands(app):
+    @app.cli.group('db')
+    def db_group():
+        """Database schema management."""
+
+    @db_group.command('upgrade')
+    def db_upgrade():
+        """Create a new database or apply pending migrations to an existing one."""
+        import migrations
+        applied = migrations.init_schema(db.engine, log=click.echo)
+        with db.engine.connect() as connection:
+            version = migrations.current_version(connection)
+        click.echo(f"Applied {len(applied)} migration(s); schema is at version {version}.")
+
+    @db_group.command('current')
+    def db_current():
+        """Show the applied and latest schema versions."""
+        import migrations
+        with db.engine.connect() as connection:
+            version = migrations.current_version(connection)
+        click.echo(f"Database version: {version if version is not None else 'unversioned'}")
+        click.echo(f"Latest version:   {migrations.head_version()}")
+
+    @db_group.command('check-plans')
+    @click.option('--user-id', default=1, show_default=True, help='User id to plug into the queries.')
+    @click.option('--category-id', default=1, show_default=True, help='Category id to plug into the queries.')
+    def db_check_plans(user_id, category_id):
+        """EXPLAIN the app's queries and report any that fall back to full table scans."""
+        from query_plans import app_queries, check_query_plans
+        problems = check_query_plans(db.engine, user_id=user_id, category_id=category_id)
+        for name, _ in app_queries(user_id, category_id):
+            status = 'FULL SCAN' if name in problems else 'ok'
+            click.echo(f"  [{status:>9}] {name}")
+            for scan in problems.get(name, []):
+                click.echo(f"              {scan}")
+        import partitioning
+        with db.engine.connect() as connection:
+            partitioned = partitioning.is_partitioned(connection)
+        if partitioned:
+            from query_plans import recent_window_listing, scanned_partitions
+            scanned = scanned_partitions(db.engine, recent_window_listing(user_id, app.config['DASHBOARD_RECENT_MONTHS']))
+            click.echo(f"Dashboard recent window reads partition(s): {', '.join(scanned) or 'none'}")
+        if problems:
+            click.echo(f"{len(problems)} query(ies) fall back to full scans.")
+            sys.exit(1)
+        click.echo("All queries use an index.")
+
+    @db_group.command('partition')
+    @click.option('--years-ahead', default=1, show_default=True,
+                  help='Also create partitions for this many years after the current one.')
+    def db_partition(years_ahead):
+        """Partition transactions by year (PostgreSQL), or add the missing yearly partitions."""
+        import partitioning
+        with db.engine.begin() as connection:
+            if not partitioning.supported(connection):
+                click.echo(f"Range partitioning needs PostgreSQL; on {connection.dialect.name} transactions "
+                           f"stays one table. Archiving and the dashboard's recent window still work.")
+                return
+            created = partitioning.partition_transactions(connection, years_ahead=years_ahead, log=click.echo)
+            years = partitioning.year_partitions(connection)
+        for name in created:
+            click.echo(f"  created {name}")
+        click.echo(f"transactions has {len(years)} yearly partition(s)"
+                   + (f", {years[0][0]} to {years[-1][0]}." if years else "."))
+
+    @app.cli.group('transactions')
+    def transactions_group():
+        """Bulk transaction operations."""
+
+    @transactions_group.command('import')
+    @click.argument('email')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'file_format', type=click.Choice(['csv', 'ofx']),
+                  help='File format (default: detected from the extension).')
+    @click.option('--category', 'default_category', default='Imported', show_default=True,
+                  help='Category for rows that do not name one.')
+    def transactions_import(email, path, file_format, default_category):
+        """Import a CSV or OFX bank statement for the user with EMAIL."""
+        import time
+        from importer import detect_format, import_statement
+        from models import User
+
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            click.echo(f"No user with email {email}")
+            sys.exit(1)
+
+        started = time.perf_counter()
+        with open(path, 'rb') as stream:
+            result = import_statement(user.id, stream, file_format or detect_format(path),
+                                      default_category=default_category)
+        elapsed = time.perf_counter() - started
+
+        click.echo(f"Imported {result.imported} transaction(s) in {elapsed:.2f}s")
+        if result.created_categories:
+            click.echo(f"Created categories: {', '.join(result.created_categories)}")
+        for line_no, message in result.errors:
+            click.echo(f"  line {line_no}: {message}")
+        if result.error_count > len(result.errors):
+            click.echo(f"  ... and {result.error_count - len(result.errors)} more")
+        if result.error_count:
+            click.echo(f"Skipped {result.error_count} invalid row(s)")
+
+    @transactions_group.command('archive')
+    @click.option('--months', type=int, help='Archive transactions older than this many months '
+                                             '(default: ARCHIVE_AFTER_MONTHS).')
+    @click.option('--dry-run', is_flag=True, help='Only report how many transactions would be archived.')
+    def transactions_archive(months, dry_run):
+        """Move old transactions into transactions_archive; totals and reports are unchanged."""
+        import archive
+        months = app.config['ARCHIVE_AFTER_MONTHS'] if months is None else months
+        cutoff = archive.month_start(months)
+        if dry_run:
+            with db.engine.connect() as connection:
+                click.echo(f"{archive.pending_count(connection, cutoff)} transaction(s) dated before "
+                           f"{cutoff.isoformat()} would be archived.")
+            return
+        moved = archive.archive_before(db.engine, cutoff, log=click.echo)
+        click.echo(f"Archived {moved} transaction(s) dated before {cutoff.isoformat()}.")
+
+    @app.cli.group('reports')
+    def reports_group():
+        """Monthly summary rollup maintenance."""
+
+    @reports_group.command('rebuild')
+    @click.option('--user-id', type=int, help='Only rebuild this user (default: everyone).')
+    def reports_rebuild(user_id):
+        """Recompute the monthly_summary rollup from live and archived transactions and verify it."""
+        import rollups
+        rollups.rebuild(user_id)
+        mismatches = rollups.verify(user_id)
+        if mismatches:
+            db.session.rollback()
+            for mismatch in mismatches:
+                click.echo(f"  {mismatch}")
+            click.echo("Rebuilt rollup does not match the transactions table; rolled back.")
+            sys.exit(1)
+        db.session.commit()
+        click.echo("Rollup rebuilt and verified.")
+
+    @reports_group.command('verify')
+    @click.option('--user-id', type=int, help='Only verify this user (default: everyone).')
+    def reports_verify(user_id):
+        """Check the monthly_summary rollup against the transactions table."""
+        import rollups
+        mismatches = rollups.verify(user_id)
+        for mismatch in mismatches:
+            click.echo(f"  {mismatch}")
+        if mismatches:
+            click.echo(f"{len(mismatches)} rollup row(s) are out of date; run 'flask reports rebuild'.")
+            sys.exit(1)
+        click.echo("Rollup matches the transactions table.")
+
+    @app.cli.group('assets')
+    def assets_group():
+        """Static asset pipeline."""
+
+    @assets_group.command('build')
+    def assets_build():
+        """Minify, fingerprint and precompress static/ into static/dist/, keeping earlier builds."""
+        from assets import brotli
+        manifest = app.extensions['assets'].build(log=click.echo)
+        variants = '.gz and .br' if brotli is not None else '.gz (install brotli for .br)'
+        click.echo(f"Built {len(manifest)} asset(s) with {variants} variants.")
@@ -0,0 +1,158 @@
+"""Streaming gzip/brotli response compression as WSGI middleware.
+
+The encoding is negotiated from Accept-Encoding (brotli when the brotli
+package is installed and the client accepts it, otherwise gzip). Each chunk
+the app yields is compressed and flushed straight away, so streamed
+responses such as the CSV export still reach the client incrementally.
+
+Responses are left alone when they already have a Content-Encoding (the
+precompressed static assets), are not a text-like type, declare a
+Content-Length below the minimum size, or ask for no-transform. Strong
+ETags on compressed responses are weakened, since the bytes differ from
+the identity encoding.
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only without it
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/x-ndjson',
+    'application/xml',
+    'image/svg+xml',
+)
+# No body, partial content or an already negotiated representation
+SKIP_STATUSES = (204, 206, 304)
+
+
+def negotiate(accept_encoding, brotli_available=brotli is not None):
+    """Pick 'br', 'gzip' or None from an Accept-Encoding header"""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    wildcard = accepted.get('*', 0.0)
+    if brotli_available and accepted.get('br', wildcard) > 0:
+        return 'br'
+    if accepted.get('gzip', accepted.get('x-gzip', wildcard)) > 0:
+        return 'gzip'
+    return None
+
+
+class _Gzip:
+    def __init__(self, level):
+        # wbits 16 + MAX_WBITS writes a gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk):
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, chunk):
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def _header(headers, name):
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CompressionMiddleware:
+    """Compress responses from the wrapped WSGI app on the fly"""
+
+    def __init__(self, app, level=6, brotli_quality=4, min_size=512):
+        self.app = app
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.min_size = min_size
+
+    def _should_compress(self, status, headers):
+        if int(status.split(' ', 1)[0]) in SKIP_STATUSES:
+            return False
+        if _header(headers, 'Content-Encoding'):
+            return False
+        content_type = (_header(headers, 'Content-Type') or '').lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        if 'no-transform' in (_header(headers, 'Cache-Control') or '').lower():
+            return False
+        length = _header(headers, 'Content-Length')
+        # Without a Content-Length the body is streamed; always worth compressing
+        return length is None or int(length) >= self.min_size
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if self.level > 0 and environ.get('REQUEST_METHOD') != 'HEAD':
+            encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return self.app(environ, start_response)
+
+        compressor = None
+
+        def compressing_start_response(status, headers, exc_info=None):
+            nonlocal compressor
+            if self._should_compress(status, headers):
+                compressor = _Brotli(self.brotli_quality) if encoding == 'br' else _Gzip(self.level)
+                headers = [(k, v) for k, v in headers if k.lower() != 'content-length']
+                headers.append(('Content-Encoding', encoding))
+            if compressor is not None or status.startswith('304'):
+                # A 304 must carry the same validator as the compressed 200 it confirms
+                headers = _add_vary(_weaken_etag(headers))
+            write = start_response(status, headers, exc_info)
+            if compressor is None:
+                return write
+            return lambda data: write(compressor.compress(data))
+
+        app_iter = self.app(environ, compressing_start_response)
+        if compressor is None:
+            return app_iter
+        return self._compressed(app_iter, compressor)
+
+    @staticmethod
+    def _compressed(app_iter, compressor):
+        try:
+            for chunk in app_iter:
+                if chunk:
+                    yield compressor.compress(chunk)
+            yield compressor.finish()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+
+def _weaken_etag(headers):
+    return [(k, f'W/{v}' if k.lower() == 'etag' and not v.startswith('W/') else v) for k, v in headers]
+
+
+def _add_vary(headers):
+    vary = _header(headers, 'Vary')
+    if vary and 'accept-encoding' in vary.lower():
+        return headers
+    headers = [(k, v) for k, v in headers if k.lower() != 'vary']
+    headers.append(('Vary', f'{vary}, Accept-Encoding' if vary else 'Accept-Encoding'))
+    return headers
@@ -0,0 +1,65 @@
+"""Worker, thread and connection pool sizing shared by gunicorn.conf.py and config.py.
+
+Every value can be overridden through the environment; the defaults are
+derived from the CPU count so that one setting scales from a laptop to a
+larger host, and the database pool of each worker is sized to the number
+of requests that worker can run at once.
+"""
+import multiprocessing
+import os
+
+WORKER_CLASSES = ('sync', 'gthread', 'gevent')
+
+
+def cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+def worker_class():
+    value = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+    if value not in WORKER_CLASSES:
+        raise ValueError(f"GUNICORN_WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}, not {value!r}")
+    return value
+
+
+def workers():
+    default = cpu_count() * 2 + 1 if worker_class() == 'sync' else cpu_count() + 1
+    return int(os.environ.get('GUNICORN_WORKERS', default))
+
+
+def threads():
+    """Request threads per worker (only gthread workers run more than one)"""
+    if worker_class() != 'gthread':
+        return 1
+    return int(os.environ.get('GUNICORN_THREADS', '4'))
+
+
+def worker_connections():
+    """Concurrent greenlets per gevent worker"""
+    return int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', '100'))
+
+
+def concurrent_requests():
+    """How many requests one worker process can be serving at the same time"""
+    return worker_connections() if worker_class() == 'gevent' else threads()
+
+
+def engine_options(database_uri):
+    """SQLAlchemy engine options with the pool sized for one worker process"""
+    if database_uri.startswith('sqlite'):
+        return {}
+
+    # gevent workers can have far more requests in flight than the database should see
+    default_pool = min(concurrent_requests(), 10)
+    pool_size = int(os.environ.get('DB_POOL_SIZE', default_pool))
+    return {
+        'pool_size': pool_size,
+        # Headroom for streamed exports, which hold a second connection while they run
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', pool_size)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', '1800')),
+    }
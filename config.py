@@ -1,6 +1,8 @@
 import os
 from dotenv import load_dotenv
 
+import concurrency
+
 load_dotenv()
 
 class Config:
@@ -12,3 +14,72 @@ class Config:
 
     SQLALCHEMY_DATABASE_URI = database_url
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool per worker process, sized from gunicorn's threads (see concurrency.py)
+    SQLALCHEMY_ENGINE_OPTIONS = concurrency.engine_options(database_url)
+
+    # Optional read replica: GET requests read from it, everything else uses the primary
+    # (see db_routing.py). After a write the session stays on the primary for
+    # REPLICA_STICKY_SECONDS so redirects after a POST see the change.
+    replica_url = os.environ.get('DATABASE_REPLICA_URL')
+    if replica_url and replica_url.startswith('postgres://'):
+        replica_url = replica_url.replace('postgres://', 'postgresql://', 1)
+
+    SQLALCHEMY_BINDS = {'replica': {'url': replica_url, **concurrency.engine_options(replica_url)}} if replica_url else {}
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', '5'))
+
+    # Number of transactions shown per dashboard page / API page
+    TRANSACTIONS_PER_PAGE = int(os.environ.get('TRANSACTIONS_PER_PAGE', '50'))
+    # Dashboard pages are read from this many recent months first, so a date-partitioned
+    # transactions table only scans recent partitions (0 disables the window)
+    DASHBOARD_RECENT_MONTHS = int(os.environ.get('DASHBOARD_RECENT_MONTHS', '12'))
+    # `flask transactions archive` moves transactions older than this many months to transactions_archive
+    ARCHIVE_AFTER_MONTHS = int(os.environ.get('ARCHIVE_AFTER_MONTHS', '36'))
+
+    # Largest accepted request body, which bounds statement uploads (bytes)
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_UPLOAD_BYTES', str(64 * 1024 * 1024)))
+
+    # Per-user page cache: 'lru' (per worker), 'shared' (RESPONSE_CACHE_URL, e.g. redis://) or 'none'.
+    # Cached pages embed a CSRF token; their key changes every half token lifetime (see cache.csrf_epoch).
+    RESPONSE_CACHE = os.environ.get('RESPONSE_CACHE', 'lru')
+    RESPONSE_CACHE_URL = os.environ.get('RESPONSE_CACHE_URL')
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', '300'))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '1024'))
+
+    # Flask-Login user loader cache, per worker (USER_CACHE_MAX_ENTRIES=0 disables it).
+    # The TTL is capped at user_cache.MAX_TTL; workers sharing USER_CACHE_SIGNAL_FILE
+    # drop a user as soon as a change to it commits (gunicorn.conf.py sets it)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', '30'))
+    USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', '4096'))
+    USER_CACHE_SIGNAL_FILE = os.environ.get('USER_CACHE_SIGNAL_FILE')
+
+    # Password hashing policy (werkzeug method string, including its cost parameters).
+    # Existing hashes made with another method are upgraded on the user's next login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # Hash/verify on a process pool of this size (0 = inline), queueing at most
+    # PASSWORD_HASH_QUEUE_LIMIT jobs before answering 503
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '2'))
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', '8'))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', '10'))
+
+    # Per-request SQL statistics (Server-Timing header and debug log line)
+    SQL_INSTRUMENTATION = os.environ.get('SQL_INSTRUMENTATION', 'true').lower() == 'true'
+    SQL_SLOWEST_STATEMENTS = int(os.environ.get('SQL_SLOWEST_STATEMENTS', '3'))
+
+    # Response compression in wsgi.py: gzip level 1-9 (0 disables compression),
+    # brotli quality 0-11, and bodies smaller than COMPRESSION_MIN_BYTES are sent as is
+    COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', '6'))
+    BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '4'))
+    COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '512'))
+
+    # Request metrics at /metrics (see metrics.py). Workers share counters through files in
+    # METRICS_DIR, which gunicorn.conf.py sets up. /metrics needs "Authorization: Bearer
+    # <METRICS_TOKEN>" when a token is set, and is only served to localhost otherwise.
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', '1'))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Sampling profiler (see profiler.py): off unless PROFILER_TOKEN is set, then requests with
+    # a matching X-Profile-Token header write a collapsed-stack profile to PROFILE_DIR
+    PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN')
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+    PROFILER_INTERVAL_MS = float(os.environ.get('PROFILER_INTERVAL_MS', '5'))
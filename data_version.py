@@ -0,0 +1,30 @@
+"""Per-user data version counter.
+
+Every change to a user's transactions or categories increments
+users.data_version in the same database transaction. Anything derived from
+that data (cached pages, ETags) can include the version in its key and so
+never needs explicit invalidation.
+"""
+from flask import g, has_request_context
+
+from models import db, User
+
+
+def bump(user_id):
+    """Increment the user's data version; call before committing a mutation"""
+    db.session.execute(
+        db.update(User).where(User.id == user_id).values(data_version=User.data_version + 1),
+        execution_options={'synchronize_session': False}
+    )
+    if has_request_context():
+        g.pop('data_versions', None)
+
+
+def current(user_id):
+    """Return the user's data version, read at most once per request"""
+    versions = g.setdefault('data_versions', {}) if has_request_context() else {}
+    if user_id not in versions:
+        versions[user_id] = db.session.execute(
+            db.select(User.data_version).where(User.id == user_id)
+        ).scalar() or 0
+    return versions[user_id]
@@ -0,0 +1,56 @@
+"""Read/write splitting between the primary database and an optional read replica.
+
+When DATABASE_REPLICA_URL is set, the replica is configured as the
+'replica' bind. GET and HEAD requests read from it; every other request,
+every flush and every INSERT/UPDATE/DELETE uses the primary.
+
+After a mutating request the browser session is pinned to the primary for
+REPLICA_STICKY_SECONDS, so the GET that follows a POST-redirect always
+sees the user's own write even if the replica is lagging.
+"""
+import time
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = 'replica'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_SESSION_KEY = '_db_primary_until'
+
+
+class RoutingSession(Session):
+    """Session that sends reads made while serving a safe request to the replica engine"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing
+                and has_request_context() and g.get('db_use_replica')
+                and not (clause is not None and getattr(clause, 'is_dml', False))):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_engine(db):
+    """Engine for a read-only job outside the session: the replica if it should be used, else the primary"""
+    if has_request_context() and g.get('db_use_replica') and REPLICA_BIND in db.engines:
+        return db.engines[REPLICA_BIND]
+    return db.engine
+
+
+def init_app(app):
+    if REPLICA_BIND not in app.config.get('SQLALCHEMY_BINDS', {}):
+        return
+
+    sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', 5)
+
+    @app.before_request
+    def _choose_database():
+        pinned = session.get(STICKY_SESSION_KEY, 0) > time.time()
+        g.db_use_replica = request.method in SAFE_METHODS and not pinned
+
+    @app.after_request
+    def _pin_to_primary(response):
+        if request.method not in SAFE_METHODS:
+            session[STICKY_SESSION_KEY] = time.time() + sticky_seconds
+        return response
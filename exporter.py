@@ -0,0 +1,83 @@
+"""Streaming CSV / NDJSON export of a user's transactions.
+
+Rows are read through a server-side cursor in fixed-size partitions and
+written out as they arrive, so memory use stays flat however long the
+history is. The export uses its own connection, opened when streaming starts
+and returned to the pool as soon as the last row is sent or the client
+disconnects. Archived transactions (see archive.py) are exported with the
+live ones.
+"""
+import csv
+import io
+import json
+
+from models import db, ArchivedTransaction, Category, Transaction
+
+CHUNK_SIZE = 1000
+
+CSV_HEADER = ('date', 'category', 'description', 'transaction_type', 'amount')
+
+
+def _filtered(model, user_id, filter_type, category_filter, start_date, end_date):
+    statement = db.select(
+        model.date, Category.name.label('category'), model.description,
+        model.transaction_type, model.amount, model.id
+    ).join(Category, model.category_id == Category.id).where(model.user_id == user_id)
+
+    if filter_type in ('income', 'expense'):
+        statement = statement.where(model.transaction_type == filter_type)
+    if category_filter != 'all':
+        statement = statement.where(model.category_id == int(category_filter))
+    if start_date:
+        statement = statement.where(model.date >= start_date)
+    if end_date:
+        statement = statement.where(model.date <= end_date)
+    return statement
+
+
+def export_statement(user_id, filter_type='all', category_filter='all', start_date=None, end_date=None):
+    """Build the export query with the dashboard's filters and an optional inclusive date range"""
+    filters = (user_id, filter_type, category_filter, start_date, end_date)
+    rows = db.union_all(_filtered(Transaction, *filters), _filtered(ArchivedTransaction, *filters)).subquery()
+    return db.select(
+        rows.c.date, rows.c.category, rows.c.description, rows.c.transaction_type, rows.c.amount
+    ).order_by(rows.c.date.desc(), rows.c.id.desc())
+
+
+def stream_rows(engine, statement, chunk_size=CHUNK_SIZE):
+    """Yield lists of result rows, chunk_size at a time, from a server-side cursor"""
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=chunk_size).execute(statement)
+        for partition in result.partitions():
+            yield partition
+
+
+def iter_csv(partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for rows in partitions:
+        for txn_date, category, description, transaction_type, amount in rows:
+            writer.writerow((txn_date.isoformat(), category, description, transaction_type, str(amount)))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_ndjson(partitions):
+    for rows in partitions:
+        yield ''.join(json.dumps({
+            'date': txn_date.isoformat(),
+            'category': category,
+            'description': description,
+            'transaction_type': transaction_type,
+            'amount': float(amount),
+        }) + '\n' for txn_date, category, description, transaction_type, amount in rows)
+
+
+FORMATS = {
+    'csv': ('text/csv', 'csv', iter_csv),
+    'ndjson': ('application/x-ndjson', 'ndjson', iter_ndjson),
+}
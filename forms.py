@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, FloatField, SelectField, DateField
+from wtforms import StringField, PasswordField, DecimalField, SelectField, DateField
 from wtforms.validators import DataRequired, Email, Length, EqualTo, ValidationError
 from models import User, Category
 from datetime import date
@@ -33,6 +33,6 @@ class CategoryForm(FlaskForm):
 class TransactionForm(FlaskForm):
     category_id = SelectField('Category', coerce=int, validators=[DataRequired()])
     description = StringField('Description', validators=[DataRequired(), Length(max=200)])
-    amount = FloatField('Amount', validators=[DataRequired()])
+    amount = DecimalField('Amount', places=2, validators=[DataRequired()])
     transaction_type = SelectField('Type', choices=[('income', 'Income'), ('expense', 'Expense')], validators=[DataRequired()])
     date = DateField('Date', default=date.today, validators=[DataRequired()])
@@ -1,12 +1,29 @@
 import os
-import multiprocessing
+import tempfile
+
+import concurrency
+import metrics
 
 
 bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
 
-workers = int(os.environ.get('GUNICORN_WORKERS', '1'))
+# Worker model: 'gthread' (default), 'gevent' (requires gevent) or 'sync'.
+# Worker, thread and database pool sizes are derived from the CPU count
+# unless overridden, see concurrency.py.
+worker_class = concurrency.worker_class()
+
+workers = concurrency.workers()
+
+threads = concurrency.threads()
+
+worker_connections = concurrency.worker_connections()
 
-worker_class = 'sync'
+# Workers share request metrics through files in this directory (see metrics.py),
+# and user cache invalidations through this file (see user_cache.py).
+# Set before the app is loaded so its config picks them up.
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), f'finance-metrics-{bind.rsplit(":", 1)[1]}'))
+os.environ.setdefault('USER_CACHE_SIGNAL_FILE',
+                      os.path.join(tempfile.gettempdir(), f'finance-user-cache-{bind.rsplit(":", 1)[1]}'))
 
 timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
 
@@ -15,7 +32,8 @@ errorlog = '-'   # Log to stderr
 loglevel = os.environ.get('LOG_LEVEL', 'info')
 
 # Preload app
-# Set to True to load the app before forking workers
+# Set to True to load the app before forking workers.
+# post_fork resets the database engine so workers never share its connections.
 preload_app = True
 
 daemon = False
@@ -27,9 +45,17 @@ tmp_upload_dir = None
 
 def on_starting(server):
     """Called just before the master process is initialized."""
+    metrics.reset_directory(os.environ['METRICS_DIR'])
+    from config import Config
+    pool = Config.SQLALCHEMY_ENGINE_OPTIONS
     print("=" * 60)
     print("Gunicorn is starting...")
-    print(f"Workers: {workers}")
+    print(f"Worker class: {worker_class}")
+    print(f"Workers: {workers} x {concurrency.concurrent_requests()} concurrent requests "
+          f"(CPUs: {concurrency.cpu_count()})")
+    if pool:
+        print(f"DB pool per worker: {pool['pool_size']} + {pool['max_overflow']} overflow "
+              f"(up to {workers * (pool['pool_size'] + pool['max_overflow'])} connections in total)")
     print(f"Preload: {preload_app}")
     print("=" * 60)
 
@@ -39,6 +65,27 @@ def when_ready(server):
     print("Gunicorn server is ready. Waiting for requests...")
     print("=" * 60)
 
+def post_fork(server, worker):
+    """Called in each worker just after it is forked from the master."""
+    if worker_class == 'gevent':
+        try:
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            server.log.warning("psycogreen is not installed; psycopg2 calls will block the gevent loop")
+
+    # Connections opened by the preloaded app in the master must not be shared
+    # between workers: drop them from this worker's pool without closing them.
+    from app import app
+    from models import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+def child_exit(server, worker):
+    """Called in the master after a worker has exited."""
+    metrics.retire_worker(os.environ['METRICS_DIR'], worker.pid)
+
 def on_exit(server):
     """Called just before exiting Gunicorn."""
     print("=" * 60)
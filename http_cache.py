@@ -0,0 +1,40 @@
+"""ETag / conditional GET support for authenticated pages.
+
+The ETag of a page is derived from the same fingerprint as the response
+cache (user, data version, endpoint, query args, session). A request whose
+If-None-Match matches gets a 304 after a single version lookup, without
+running the page's queries or rendering its template. The fingerprint also
+changes every half CSRF token lifetime, so a browser that keeps getting 304s
+still picks up a fresh token before the one in its copy of the page expires.
+"""
+import hashlib
+from functools import wraps
+
+from flask import request, session, make_response
+
+from cache import page_fingerprint
+
+
+def conditional(view):
+    """Answer matching If-None-Match requests to a login-protected GET view with 304 Not Modified"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Pages showing flashed messages differ from the fingerprinted page
+        if request.method != 'GET' or session.get('_flashes'):
+            return view(*args, **kwargs)
+
+        etag = hashlib.sha256(page_fingerprint().encode()).hexdigest()[:32]
+
+        # Weak comparison: compression in wsgi.py sends the ETag as W/"..."
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or session.get('_flashes'):
+                return response
+
+        response.set_etag(etag)
+        # Private to the user's browser, and always revalidated
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
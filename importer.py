@@ -0,0 +1,278 @@
+"""Streaming import of bank statements (CSV and OFX).
+
+Files are parsed row by row from the upload stream, so memory use does not
+grow with file size. Rows are inserted in batches with a single executemany
+(or COPY on PostgreSQL). Rows that cannot be parsed are skipped and reported
+with their line number instead of aborting the import.
+"""
+import csv
+import io
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, date
+
+from models import db, Category, Transaction
+from money import Money
+from rollups import DeltaBatch
+import data_version
+
+DEFAULT_CATEGORY = 'Imported'
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+CSV_COLUMN_ALIASES = {
+    'date': ('date', 'transaction date', 'posted date', 'posting date'),
+    'description': ('description', 'details', 'memo', 'name', 'payee', 'narrative'),
+    'amount': ('amount', 'value', 'transaction amount'),
+    'transaction_type': ('transaction_type', 'type', 'transaction type'),
+    'category': ('category', 'category name'),
+}
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d', '%d %b %Y')
+
+TYPE_ALIASES = {
+    'income': 'income', 'credit': 'income', 'cr': 'income', 'deposit': 'income',
+    'expense': 'expense', 'debit': 'expense', 'dr': 'expense', 'payment': 'expense',
+}
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    created_categories: list = field(default_factory=list)
+    errors: list = field(default_factory=list)  # (line number, message)
+    error_count: int = 0
+
+    def add_error(self, line_no, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_no, message))
+
+
+def detect_format(filename):
+    """Return 'ofx' or 'csv' based on the file extension"""
+    return 'ofx' if filename.lower().rsplit('.', 1)[-1] in ('ofx', 'qfx') else 'csv'
+
+
+def parse_date(value):
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f'unrecognised date {value!r}')
+
+
+def parse_amount(value):
+    cleaned = value.strip().replace(',', '').replace('£', '')
+    try:
+        return Money.parse(cleaned)
+    except ValueError:
+        raise ValueError(f'invalid amount {value!r}')
+
+
+def iter_csv_records(stream):
+    """Yield (line number, record) for each data row of a CSV statement.
+
+    The header row is matched against common bank export column names.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    try:
+        header = next(reader)
+    except StopIteration:
+        return
+
+    normalised = [h.strip().lower() for h in header]
+    columns = {}
+    for key, aliases in CSV_COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in normalised:
+                columns[key] = normalised.index(alias)
+                break
+
+    missing = [key for key in ('date', 'description', 'amount') if key not in columns]
+    if missing:
+        raise ValueError(f"CSV header is missing required column(s): {', '.join(missing)}")
+
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        yield reader.line_num, {
+            key: row[index] if index < len(row) else '' for key, index in columns.items()
+        }
+
+
+_OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+def iter_ofx_records(stream, chunk_size=64 * 1024):
+    """Yield (transaction number, record) for each <STMTTRN> in an OFX 1.x (SGML) or 2.x (XML) file"""
+    buffer = ''
+    current = None
+    count = 0
+    decoder = io.TextIOWrapper(stream, encoding='utf-8', errors='replace')
+
+    while True:
+        chunk = decoder.read(chunk_size)
+        buffer += chunk
+        # Only tokenise up to the last tag start so a tag split across chunks is kept whole
+        cut = len(buffer) if not chunk else buffer.rfind('<')
+        if cut <= 0 and chunk:
+            continue
+
+        for closing, tag, value in _OFX_TAG.findall(buffer[:cut]):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing and current is not None:
+                    count += 1
+                    yield count, current
+                    current = None
+                elif not closing:
+                    current = {}
+            elif current is not None and not closing:
+                current[tag] = value.strip()
+        buffer = buffer[cut:]
+
+        if not chunk:
+            break
+
+
+def _ofx_to_record(ofx):
+    description = ofx.get('NAME') or ofx.get('MEMO') or ''
+    if ofx.get('NAME') and ofx.get('MEMO'):
+        description = f"{ofx['NAME']} - {ofx['MEMO']}"
+    return {
+        'date': ofx.get('DTPOSTED', '')[:8],
+        'description': description,
+        'amount': ofx.get('TRNAMT', ''),
+        'transaction_type': '',
+        'category': '',
+    }
+
+
+def to_transaction_values(record, default_category):
+    """Validate a raw record and return (category name, column values); raises ValueError"""
+    date_str = (record.get('date') or '').strip()
+    if re.fullmatch(r'\d{8}', date_str):
+        txn_date = date(int(date_str[:4]), int(date_str[4:6]), int(date_str[6:8]))
+    elif date_str:
+        txn_date = parse_date(date_str)
+    else:
+        raise ValueError('date is required')
+
+    description = (record.get('description') or '').strip()
+    if not description:
+        raise ValueError('description is required')
+
+    amount = parse_amount(record.get('amount') or '')
+    if not amount:
+        raise ValueError('amount must not be zero')
+
+    type_value = (record.get('transaction_type') or '').strip().lower()
+    if type_value:
+        if type_value not in TYPE_ALIASES:
+            raise ValueError(f'unknown transaction type {type_value!r}')
+        transaction_type = TYPE_ALIASES[type_value]
+    else:
+        transaction_type = 'expense' if amount < Money(0) else 'income'
+
+    category = (record.get('category') or '').strip()[:50] or default_category
+
+    return category, {
+        'description': description[:200],
+        'amount': abs(amount),
+        'transaction_type': transaction_type,
+        'date': txn_date,
+    }
+
+
+class _CategoryResolver:
+    """Maps category names to ids for one user, creating missing categories on first use"""
+
+    def __init__(self, user_id, result):
+        self.user_id = user_id
+        self.result = result
+        self.ids = dict(db.session.query(Category.name, Category.id).filter_by(user_id=user_id).all())
+
+    def __call__(self, name):
+        category_id = self.ids.get(name)
+        if category_id is None:
+            category = Category(user_id=self.user_id, name=name)
+            db.session.add(category)
+            db.session.flush()
+            category_id = self.ids[name] = category.id
+            self.result.created_categories.append(name)
+        return category_id
+
+
+_COPY_COLUMNS = ('user_id', 'category_id', 'description', 'amount', 'transaction_type', 'date', 'created_at')
+
+
+def _insert_batch(batch):
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql' and connection.dialect.driver == 'psycopg2':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for values in batch:
+            # COPY bypasses the column types, so amounts are written as their stored pence
+            writer.writerow([values[column].pence if column == 'amount' else values[column]
+                             for column in _COPY_COLUMNS])
+        buffer.seek(0)
+        with connection.connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY transactions ({', '.join(_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    else:
+        connection.execute(db.insert(Transaction), batch)
+
+
+def import_transactions(user_id, records, default_category=DEFAULT_CATEGORY, batch_size=BATCH_SIZE):
+    """Insert (line number, record) pairs for a user in batches and commit once at the end.
+
+    Invalid records are skipped and listed in the result's errors; a database
+    error rolls back the whole import.
+    """
+    result = ImportResult()
+    resolve_category = _CategoryResolver(user_id, result)
+    rollup = DeltaBatch()
+    created_at = datetime.utcnow()
+    batch = []
+
+    try:
+        for line_no, record in records:
+            try:
+                category, values = to_transaction_values(record, default_category)
+            except ValueError as e:
+                result.add_error(line_no, str(e))
+                continue
+
+            values.update(user_id=user_id, category_id=resolve_category(category), created_at=created_at)
+            batch.append(values)
+            rollup.add(values)
+            if len(batch) >= batch_size:
+                _insert_batch(batch)
+                result.imported += len(batch)
+                batch = []
+
+        if batch:
+            _insert_batch(batch)
+            result.imported += len(batch)
+
+        rollup.apply()
+        data_version.bump(user_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return result
+
+
+def import_statement(user_id, stream, file_format, default_category=DEFAULT_CATEGORY):
+    """Parse a CSV or OFX statement from a binary stream and import it for a user"""
+    if file_format == 'ofx':
+        records = ((n, _ofx_to_record(ofx)) for n, ofx in iter_ofx_records(stream))
+    else:
+        records = iter_csv_records(stream)
+    return import_transactions(user_id, records, default_category=default_category)
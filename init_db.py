@@ -1,5 +1,6 @@
 from app import app
 from models import db
+import migrations
 
 with app.app_context():
     # Drop all tables and recreate (WARNING: This will delete all data!)
@@ -9,7 +10,9 @@ with app.app_context():
 
     # Create all tables
     db.create_all()
+    migrations.stamp(db.engine)
     print("Database tables created successfully!")
+    print(f"Schema version: {migrations.head_version()}")
     print("\nTables created:")
     print("- users")
     print("- categories")
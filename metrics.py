@@ -0,0 +1,258 @@
+"""Per-endpoint request metrics, served in Prometheus text format at /metrics.
+
+Each worker process records a latency histogram, an error count (5xx
+responses and unhandled exceptions) and an in-flight gauge per endpoint
+and method. With METRICS_DIR set, every worker writes its counters to
+worker-<pid>.json in that directory at most every METRICS_FLUSH_SECONDS,
+and /metrics adds up the files of all workers, so any worker can answer
+for the whole server. gunicorn.conf.py points METRICS_DIR at a fresh
+directory and, when a worker exits, folds its counters into archive.json
+and drops its in-flight requests. Without METRICS_DIR, /metrics reports
+this process only (the development server).
+"""
+import glob
+import hmac
+import ipaddress
+import json
+import os
+import tempfile
+import threading
+import time
+
+from flask import Response, abort, g, request
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+ARCHIVE_FILE = 'archive.json'
+
+
+def _empty():
+    return {'histograms': {}, 'errors': {}, 'in_flight': {}}
+
+
+def merge(snapshots):
+    """Add up snapshots from several processes into one"""
+    total = _empty()
+    for snapshot in snapshots:
+        for key, histogram in snapshot.get('histograms', {}).items():
+            into = total['histograms'].setdefault(key, {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0})
+            into['buckets'] = [a + b for a, b in zip(into['buckets'], histogram['buckets'])]
+            into['sum'] += histogram['sum']
+            into['count'] += histogram['count']
+        for name in ('errors', 'in_flight'):
+            for key, value in snapshot.get(name, {}).items():
+                total[name][key] = total[name].get(key, 0) + value
+    return total
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # Removed by a worker exit, or caught mid-replace on a filesystem without atomic renames
+        return _empty()
+
+
+def _write(path, snapshot):
+    # Write then rename, so readers never see a half-written file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+def reset_directory(directory):
+    """Remove the files of a previous server run (called by gunicorn before forking workers)"""
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        os.remove(path)
+
+
+def retire_worker(directory, pid):
+    """Fold an exited worker's counters into the archive; its in-flight requests are gone with it"""
+    path = os.path.join(directory, f'worker-{pid}.json')
+    if not os.path.exists(path):
+        return
+    snapshot = _read(path)
+    snapshot['in_flight'] = {}
+    archive_path = os.path.join(directory, ARCHIVE_FILE)
+    _write(archive_path, merge([_read(archive_path), snapshot]))
+    os.remove(path)
+
+
+def _key(endpoint, method):
+    return f'{endpoint} {method}'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render(snapshot):
+    """Prometheus text exposition (format 0.0.4) of a snapshot"""
+    lines = [
+        '# HELP finance_request_duration_seconds Request latency by endpoint and method.',
+        '# TYPE finance_request_duration_seconds histogram',
+    ]
+    for key, histogram in sorted(snapshot['histograms'].items()):
+        endpoint, method = key.split(' ', 1)
+        labels = f'endpoint="{_escape(endpoint)}",method="{method}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), histogram['buckets']):
+            cumulative += count
+            lines.append(f'finance_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'finance_request_duration_seconds_sum{{{labels}}} {histogram["sum"]:.6f}')
+        lines.append(f'finance_request_duration_seconds_count{{{labels}}} {histogram["count"]}')
+
+    lines += [
+        '# HELP finance_request_errors_total Requests that ended in a 5xx response or an unhandled exception.',
+        '# TYPE finance_request_errors_total counter',
+    ]
+    for key, count in sorted(snapshot['errors'].items()):
+        endpoint, method, status = key.split(' ', 2)
+        lines.append(f'finance_request_errors_total{{endpoint="{_escape(endpoint)}",method="{method}",'
+                     f'status="{status}"}} {count}')
+
+    lines += [
+        '# HELP finance_requests_in_flight Requests being served right now.',
+        '# TYPE finance_requests_in_flight gauge',
+    ]
+    for key, count in sorted(snapshot['in_flight'].items()):
+        endpoint, method = key.split(' ', 1)
+        lines.append(f'finance_requests_in_flight{{endpoint="{_escape(endpoint)}",method="{method}"}} {count}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.directory = None
+        self.flush_interval = 1.0
+        self.token = None
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # A forked worker starts from zero and writes its own file
+        self._lock = threading.Lock()
+        self._data = _empty()
+        self._dirty = False
+        self._flusher = None
+
+    def init_app(self, app):
+        self.directory = app.config.get('METRICS_DIR') or None
+        self.flush_interval = app.config.get('METRICS_FLUSH_SECONDS', 1.0)
+        self.token = app.config.get('METRICS_TOKEN') or None
+
+        # Registered before the other hooks so cache hits answered from a
+        # before_request function are measured too
+        app.before_request_funcs.setdefault(None, []).insert(0, self._start)
+        app.after_request(self._record_status)
+        app.teardown_request(self._finish)
+        app.add_url_rule('/metrics', 'metrics', self.serve)
+
+    # Recording
+
+    def _start(self):
+        g.metrics_key = _key(request.endpoint or 'unmatched', request.method)
+        g.metrics_start = time.perf_counter()
+        with self._lock:
+            in_flight = self._data['in_flight']
+            in_flight[g.metrics_key] = in_flight.get(g.metrics_key, 0) + 1
+            self._dirty = True
+
+    def _record_status(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _finish(self, exc):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        key = g.pop('metrics_key')
+        status = 500 if exc is not None else g.pop('metrics_status', 500)
+        bucket = next((i for i, bound in enumerate(BUCKETS) if duration <= bound), len(BUCKETS))
+
+        with self._lock:
+            data = self._data
+            data['in_flight'][key] -= 1
+            histogram = data['histograms'].setdefault(key, {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0})
+            histogram['buckets'][bucket] += 1
+            histogram['sum'] += duration
+            histogram['count'] += 1
+            if status >= 500:
+                error_key = f'{key} {status}'
+                data['errors'][error_key] = data['errors'].get(error_key, 0) + 1
+            self._dirty = True
+
+        if self.directory and self._flusher is None:
+            self._start_flusher()
+
+    def snapshot(self):
+        """A copy of this process's counters"""
+        with self._lock:
+            return json.loads(json.dumps(self._data))
+
+    # Sharing between workers
+
+    def _path(self, pid=None):
+        return os.path.join(self.directory, f'worker-{pid or os.getpid()}.json')
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Write this worker's counters to the shared directory if they changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            data = json.loads(json.dumps(self._data))
+        try:
+            _write(self._path(), data)
+        except OSError:
+            # Try again on the next tick
+            self._dirty = True
+
+    def collect(self):
+        """Counters of every worker sharing the directory, with this worker's own counters current"""
+        if not self.directory:
+            return self.snapshot()
+        own = os.path.basename(self._path())
+        others = [_read(path) for path in glob.glob(os.path.join(self.directory, '*.json'))
+                  if os.path.basename(path) != own]
+        return merge(others + [self.snapshot()])
+
+    # Endpoint
+
+    def _allowed(self):
+        if self.token:
+            header = request.headers.get('Authorization', '')
+            return hmac.compare_digest(header, f'Bearer {self.token}')
+        # Without a token, only scrapers on this host may read the metrics
+        try:
+            return ipaddress.ip_address(request.remote_addr or '').is_loopback
+        except ValueError:
+            return False
+
+    def serve(self):
+        """Prometheus text endpoint"""
+        if not self._allowed():
+            abort(404)
+        return Response(render(self.collect()), content_type='text/plain; version=0.0.4; charset=utf-8',
+                        headers={'Cache-Control': 'no-store'})
+
+
+request_metrics = RequestMetrics()
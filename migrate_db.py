@@ -26,14 +26,21 @@ def main():
         print(f"✗ Import failed: {e}")
         sys.exit(1)
 
+    import migrations
+
     tables = list(db.metadata.tables.keys())
     print(f"\nFound {len(tables)} models: {', '.join(tables)}")
+    print(f"Latest schema version: {migrations.head_version()}")
 
-    print("\nCreating database tables...")
+    print("\nApplying schema migrations...")
     try:
         with app.app_context():
-            db.create_all()
-            print("✓ Database tables created successfully!")
+            with db.engine.connect() as connection:
+                before = migrations.current_version(connection)
+            print(f"  Current schema version: {before if before is not None else 'unversioned'}")
+
+            applied = migrations.init_schema(db.engine, log=lambda msg: print(f"  {msg}"))
+            print(f"✓ Applied {len(applied)} migration(s)")
 
             print("\nVerifying tables...")
             try:
@@ -47,7 +54,7 @@ def main():
                 print(f"  ⚠ Warning: Could not verify tables: {e}")
 
     except Exception as e:
-        print(f"✗ Failed to create tables: {e}")
+        print(f"✗ Failed to migrate database: {e}")
         print(f"\nError type: {type(e).__name__}")
         import traceback
         traceback.print_exc()
@@ -0,0 +1,353 @@
+"""Versioned schema migrations.
+
+Each migration is a function registered with the @migration decorator under
+an increasing version number. Applied versions are recorded in the
+schema_migrations table, so upgrade() only runs what a database is missing
+and can evolve a live database in place.
+
+A brand new database is created straight from the models and stamped with
+the latest version, since the models always describe the newest schema.
+"""
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+
+from models import db
+
+MIGRATIONS = []
+
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('version', db.Integer, primary_key=True, autoincrement=False),
+    db.Column('description', db.String(200), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False),
+)
+
+
+def migration(version, description):
+    """Register a function(connection) as the migration for the given version"""
+    def decorator(fn):
+        if any(m[0] == version for m in MIGRATIONS):
+            raise ValueError(f'Duplicate migration version {version}')
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+def head_version():
+    """Return the newest migration version known to this codebase"""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(connection):
+    """Return the newest version applied to the database, or None if it is unversioned"""
+    if not inspect(connection).has_table(schema_migrations.name):
+        return None
+    return connection.execute(db.select(db.func.max(schema_migrations.c.version))).scalar() or 0
+
+
+def _record(connection, version, description):
+    connection.execute(schema_migrations.insert().values(
+        version=version, description=description, applied_at=datetime.utcnow()
+    ))
+
+
+def stamp(engine, version=None):
+    """Mark every migration up to version (default: head) as applied without running it"""
+    version = head_version() if version is None else version
+    with engine.begin() as connection:
+        schema_migrations.create(connection, checkfirst=True)
+        applied = {row[0] for row in connection.execute(db.select(schema_migrations.c.version))}
+        for v, description, _ in MIGRATIONS:
+            if v <= version and v not in applied:
+                _record(connection, v, description)
+
+
+def upgrade(engine, target=None, log=print):
+    """Apply every pending migration up to target (default: head), each in its own transaction.
+
+    Returns the list of versions that were applied.
+    """
+    target = head_version() if target is None else target
+
+    with engine.begin() as connection:
+        schema_migrations.create(connection, checkfirst=True)
+        applied = {row[0] for row in connection.execute(db.select(schema_migrations.c.version))}
+
+    ran = []
+    for version, description, fn in MIGRATIONS:
+        if version > target or version in applied:
+            continue
+        log(f"Applying migration {version}: {description}")
+        with engine.begin() as connection:
+            fn(connection)
+            _record(connection, version, description)
+        ran.append(version)
+    return ran
+
+
+def init_schema(engine, log=print):
+    """Bring any database up to date: create and stamp a new one, migrate an existing one"""
+    with engine.connect() as connection:
+        is_new = not inspect(connection).has_table('users')
+
+    if is_new:
+        log("Creating tables from models...")
+        db.metadata.create_all(engine)
+        stamp(engine)
+        return []
+
+    return upgrade(engine, log=log)
+
+
+def ensure_schema(engine, log=print):
+    """Startup check: one query when the schema is already current, init_schema() otherwise"""
+    try:
+        with engine.connect() as connection:
+            version = connection.execute(text('SELECT MAX(version) FROM schema_migrations')).scalar()
+    except DBAPIError:
+        # No schema_migrations table yet: a new or pre-migrations database
+        version = None
+
+    if version == head_version():
+        return []
+    return init_schema(engine, log=log)
+
+
+# ---------------------------------------------------------------------------
+# Migrations
+#
+# Migrations use literal DDL rather than the models, because the models
+# describe the newest schema and a migration must keep meaning what it meant
+# when it was written.
+# ---------------------------------------------------------------------------
+
+@migration(1, 'Initial schema: users, categories, transactions')
+def _initial_schema(connection):
+    # Databases created before migrations existed already have these tables
+    id_column = 'INTEGER NOT NULL PRIMARY KEY' if connection.dialect.name == 'sqlite' else 'SERIAL PRIMARY KEY'
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS users (
+            id {id_column},
+            username VARCHAR(80) NOT NULL UNIQUE,
+            email VARCHAR(120) NOT NULL UNIQUE,
+            password_hash VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP
+        )
+    """))
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS categories (
+            id {id_column},
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            name VARCHAR(50) NOT NULL,
+            created_at TIMESTAMP
+        )
+    """))
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id {id_column},
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            category_id INTEGER NOT NULL REFERENCES categories (id),
+            description VARCHAR(200) NOT NULL,
+            amount FLOAT NOT NULL,
+            transaction_type VARCHAR(10) NOT NULL,
+            date DATE NOT NULL,
+            created_at TIMESTAMP
+        )
+    """))
+
+
+@migration(2, 'Add indexes for per-user transaction and category lookups')
+def _add_lookup_indexes(connection):
+    duplicates = connection.execute(text("""
+        SELECT user_id, name, COUNT(*) FROM categories
+        GROUP BY user_id, name HAVING COUNT(*) > 1
+    """)).fetchall()
+    if duplicates:
+        listing = ', '.join(f"user {user_id}: {name!r} x{count}" for user_id, name, count in duplicates)
+        raise RuntimeError(f"Cannot add unique (user_id, name) index, duplicate categories exist: {listing}")
+
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_categories_user_name ON categories (user_id, name)"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_user_date ON transactions (user_id, date, id)"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_user_type_date "
+        "ON transactions (user_id, transaction_type, date, id)"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_category_date ON transactions (category_id, date, id)"))
+
+
+@migration(3, 'Add monthly_summary rollup table and backfill it')
+def _add_monthly_summary(connection):
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS monthly_summary (
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            category_id INTEGER NOT NULL REFERENCES categories (id),
+            year_month VARCHAR(7) NOT NULL,
+            transaction_type VARCHAR(10) NOT NULL,
+            total FLOAT NOT NULL DEFAULT 0,
+            transaction_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, category_id, year_month, transaction_type)
+        )
+    """))
+    month = "to_char(date, 'YYYY-MM')" if connection.dialect.name == 'postgresql' else "strftime('%Y-%m', date)"
+    connection.execute(text("DELETE FROM monthly_summary"))
+    connection.execute(text(f"""
+        INSERT INTO monthly_summary (user_id, category_id, year_month, transaction_type, total, transaction_count)
+        SELECT user_id, category_id, {month}, transaction_type, SUM(amount), COUNT(*)
+        FROM transactions
+        GROUP BY user_id, category_id, {month}, transaction_type
+    """))
+
+
+@migration(4, 'Add users.data_version for cache invalidation')
+def _add_user_data_version(connection):
+    connection.execute(text("ALTER TABLE users ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0"))
+
+
+@migration(5, 'Add a full-text search index on transaction descriptions')
+def _add_description_search(connection):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_transactions_description_search "
+            "ON transactions USING GIN (to_tsvector('simple', description))"))
+    elif connection.dialect.name == 'sqlite':
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5("
+            "description, content='transactions', content_rowid='id', prefix='2 3')"))
+        connection.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN
+                INSERT INTO transactions_fts (rowid, description) VALUES (new.id, new.description);
+            END
+        """))
+        connection.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+                INSERT INTO transactions_fts (transactions_fts, rowid, description)
+                VALUES ('delete', old.id, old.description);
+            END
+        """))
+        connection.execute(text("""
+            CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF description ON transactions BEGIN
+                INSERT INTO transactions_fts (transactions_fts, rowid, description)
+                VALUES ('delete', old.id, old.description);
+                INSERT INTO transactions_fts (rowid, description) VALUES (new.id, new.description);
+            END
+        """))
+        # Index the rows that existed before the triggers
+        connection.execute(text("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')"))
+
+
+@migration(6, 'Store amounts and rollup totals as integer pence')
+def _amounts_to_pence(connection):
+    # Rounded through numeric on PostgreSQL so 10.005 stored as 10.00499... becomes 1001, as displayed
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(
+            "ALTER TABLE transactions ALTER COLUMN amount TYPE BIGINT USING round(amount::numeric * 100)::bigint"))
+    else:
+        # SQLite cannot change a column's type; swap in a new column (needs SQLite 3.35+ for DROP COLUMN)
+        connection.execute(text("ALTER TABLE transactions ADD COLUMN amount_pence BIGINT NOT NULL DEFAULT 0"))
+        connection.execute(text("UPDATE transactions SET amount_pence = CAST(ROUND(amount * 100) AS INTEGER)"))
+        connection.execute(text("ALTER TABLE transactions DROP COLUMN amount"))
+        connection.execute(text("ALTER TABLE transactions RENAME COLUMN amount_pence TO amount"))
+
+    # The rollup is derived data: recreate it with integer totals summed from the converted amounts
+    month = "to_char(date, 'YYYY-MM')" if connection.dialect.name == 'postgresql' else "strftime('%Y-%m', date)"
+    connection.execute(text("DROP TABLE monthly_summary"))
+    connection.execute(text("""
+        CREATE TABLE monthly_summary (
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            category_id INTEGER NOT NULL REFERENCES categories (id),
+            year_month VARCHAR(7) NOT NULL,
+            transaction_type VARCHAR(10) NOT NULL,
+            total BIGINT NOT NULL DEFAULT 0,
+            transaction_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, category_id, year_month, transaction_type)
+        )
+    """))
+    connection.execute(text(f"""
+        INSERT INTO monthly_summary (user_id, category_id, year_month, transaction_type, total, transaction_count)
+        SELECT user_id, category_id, {month}, transaction_type, SUM(amount), COUNT(*)
+        FROM transactions
+        GROUP BY user_id, category_id, {month}, transaction_type
+    """))
+
+
+@migration(7, 'Add transactions_archive for archived history')
+def _add_transactions_archive(connection):
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS transactions_archive (
+            id INTEGER NOT NULL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            category_id INTEGER NOT NULL REFERENCES categories (id),
+            description VARCHAR(200) NOT NULL,
+            amount BIGINT NOT NULL,
+            transaction_type VARCHAR(10) NOT NULL,
+            date DATE NOT NULL,
+            created_at TIMESTAMP
+        )
+    """))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_archive_user_date ON transactions_archive (user_id, date, id)"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_archive_category ON transactions_archive (category_id)"))
+
+
+@migration(8, 'Stop SQLite reusing transaction ids that were archived')
+def _transactions_autoincrement(connection):
+    # PostgreSQL ids come from a sequence, which never hands out an id twice
+    if connection.dialect.name != 'sqlite':
+        return
+
+    # Without AUTOINCREMENT SQLite gives the next row MAX(id) + 1, i.e. the id of the newest
+    # row again once it is archived. Only a rebuilt table can gain AUTOINCREMENT.
+    columns = 'id, user_id, category_id, description, amount, transaction_type, date, created_at'
+    connection.execute(text("""
+        CREATE TABLE transactions_rebuilt (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            category_id INTEGER NOT NULL REFERENCES categories (id),
+            description VARCHAR(200) NOT NULL,
+            amount BIGINT NOT NULL,
+            transaction_type VARCHAR(10) NOT NULL,
+            date DATE NOT NULL,
+            created_at TIMESTAMP
+        )
+    """))
+    connection.execute(text(f"INSERT INTO transactions_rebuilt ({columns}) SELECT {columns} FROM transactions"))
+    # Also drops the full-text search triggers; transactions_fts keeps its rows, as the ids do not change
+    connection.execute(text("DROP TABLE transactions"))
+    connection.execute(text("ALTER TABLE transactions_rebuilt RENAME TO transactions"))
+
+    # Continue after the highest id ever used, archived ones included
+    connection.execute(text("DELETE FROM sqlite_sequence WHERE name = 'transactions'"))
+    connection.execute(text("""
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT 'transactions', COALESCE(MAX(id), 0)
+        FROM (SELECT id FROM transactions UNION ALL SELECT id FROM transactions_archive)
+    """))
+
+    connection.execute(text("CREATE INDEX ix_transactions_user_date ON transactions (user_id, date, id)"))
+    connection.execute(text(
+        "CREATE INDEX ix_transactions_user_type_date ON transactions (user_id, transaction_type, date, id)"))
+    connection.execute(text("CREATE INDEX ix_transactions_category_date ON transactions (category_id, date, id)"))
+    connection.execute(text("""
+        CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO transactions_fts (rowid, description) VALUES (new.id, new.description);
+        END
+    """))
+    connection.execute(text("""
+        CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description)
+            VALUES ('delete', old.id, old.description);
+        END
+    """))
+    connection.execute(text("""
+        CREATE TRIGGER transactions_fts_update AFTER UPDATE OF description ON transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description)
+            VALUES ('delete', old.id, old.description);
+            INSERT INTO transactions_fts (rowid, description) VALUES (new.id, new.description);
+        END
+    """))
@@ -1,9 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+import passwords
+from db_routing import RoutingSession
+from money import Money, MoneyType
 from datetime import datetime
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -13,15 +16,20 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped by every change to the user's transactions or categories (see data_version.py)
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     transactions = db.relationship('Transaction', backref='user', lazy=True, cascade='all, delete-orphan')
     categories = db.relationship('Category', backref='user', lazy=True, cascade='all, delete-orphan')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return passwords.needs_rehash(self.password_hash)
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -29,6 +37,9 @@ class User(UserMixin, db.Model):
 
 class Category(db.Model):
     __tablename__ = 'categories'
+    __table_args__ = (
+        db.Index('uq_categories_user_name', 'user_id', 'name', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -43,15 +54,99 @@ class Category(db.Model):
 
 class Transaction(db.Model):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # Dashboard listing and totals: newest first within a user
+        db.Index('ix_transactions_user_date', 'user_id', 'date', 'id'),
+        # Dashboard listing filtered by income/expense
+        db.Index('ix_transactions_user_type_date', 'user_id', 'transaction_type', 'date', 'id'),
+        # Category filter and per-category transaction counts
+        db.Index('ix_transactions_category_date', 'category_id', 'date', 'id'),
+        # Never reuse the id of a deleted or archived row: transactions_archive keeps the ids
+        {'sqlite_autoincrement': True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
     description = db.Column(db.String(200), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(MoneyType, nullable=False)  # pence
     transaction_type = db.Column(db.String(10), nullable=False)  # 'income' or 'expense'
     date = db.Column(db.Date, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
         return f'<Transaction {self.description} - £{self.amount}>'
+
+
+# Full-text index on transaction descriptions, used by search.py. Neither form can be
+# declared as a Column or Index, so they are created alongside the table.
+SEARCH_INDEX_DDL = {
+    # GIN index on the same expression search.py matches against
+    'postgresql': [
+        "CREATE INDEX IF NOT EXISTS ix_transactions_description_search "
+        "ON transactions USING GIN (to_tsvector('simple', description))",
+    ],
+    # FTS5 table over transactions.description, kept in sync by triggers
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5("
+        "description, content='transactions', content_rowid='id', prefix='2 3')",
+        "CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN "
+        "INSERT INTO transactions_fts (rowid, description) VALUES (new.id, new.description); END",
+        "CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN "
+        "INSERT INTO transactions_fts (transactions_fts, rowid, description) "
+        "VALUES ('delete', old.id, old.description); END",
+        "CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF description ON transactions BEGIN "
+        "INSERT INTO transactions_fts (transactions_fts, rowid, description) "
+        "VALUES ('delete', old.id, old.description); "
+        "INSERT INTO transactions_fts (rowid, description) VALUES (new.id, new.description); END",
+    ],
+}
+
+for _dialect, _statements in SEARCH_INDEX_DDL.items():
+    for _statement in _statements:
+        event.listen(Transaction.__table__, 'after_create', DDL(_statement).execute_if(dialect=_dialect))
+
+
+class ArchivedTransaction(db.Model):
+    """A transaction moved out of the live table by archive.py.
+
+    Same columns and ids as transactions. Archived rows are no longer listed,
+    searched or edited, but they stay in monthly_summary, so totals and
+    reports still include them, and exports read them back.
+    """
+    __tablename__ = 'transactions_archive'
+    __table_args__ = (
+        db.Index('ix_transactions_archive_user_date', 'user_id', 'date', 'id'),
+        db.Index('ix_transactions_archive_category', 'category_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    description = db.Column(db.String(200), nullable=False)
+    amount = db.Column(MoneyType, nullable=False)  # pence
+    transaction_type = db.Column(db.String(10), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<ArchivedTransaction {self.description} - £{self.amount}>'
+
+
+class MonthlySummary(db.Model):
+    """Per-user rollup of transaction totals by category, month and type.
+
+    Maintained incrementally by rollups.py whenever a transaction is added,
+    edited or deleted, so reports never have to scan the transactions table.
+    """
+    __tablename__ = 'monthly_summary'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), primary_key=True)
+    year_month = db.Column(db.String(7), primary_key=True)  # 'YYYY-MM'
+    transaction_type = db.Column(db.String(10), primary_key=True)
+    total = db.Column(MoneyType, nullable=False, default=Money(0))  # pence
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<MonthlySummary {self.user_id} {self.year_month} {self.transaction_type} £{self.total}>'
@@ -0,0 +1,113 @@
+"""Exact money amounts, stored as integer pence.
+
+Money is the value type the models hand out and accept: an immutable
+whole number of pence with exact arithmetic and "12.34" formatting.
+MoneyType maps it to a BIGINT column, so SUM() over amounts is integer
+arithmetic in the database and comes back as Money as well.
+"""
+from decimal import Decimal, InvalidOperation
+from functools import total_ordering
+
+from sqlalchemy import BigInteger
+from sqlalchemy.types import TypeDecorator
+
+PENCE = Decimal(100)
+
+
+@total_ordering
+class Money:
+    """An amount of money in pence"""
+    __slots__ = ('pence',)
+
+    def __init__(self, pence=0):
+        # Database drivers hand SUM(bigint) back as int or Decimal
+        if isinstance(pence, float) or int(pence) != pence:
+            raise TypeError(f'Money takes whole pence, not {pence!r}; use Money.parse() for pounds')
+        object.__setattr__(self, 'pence', int(pence))
+
+    @classmethod
+    def parse(cls, value):
+        """Money from pounds: a string such as "12.34", a Decimal or an int. Raises ValueError"""
+        try:
+            pounds = Decimal(value.strip() if isinstance(value, str) else str(value))
+        except (InvalidOperation, TypeError):
+            raise ValueError(f'invalid amount {value!r}')
+        if not pounds.is_finite() or pounds.as_tuple().exponent < -2:
+            raise ValueError(f'invalid amount {value!r}')
+        return cls(int(pounds * PENCE))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Money is immutable')
+
+    def __add__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return Money(self.pence + other.pence)
+
+    def __sub__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return Money(self.pence - other.pence)
+
+    def __neg__(self):
+        return Money(-self.pence)
+
+    def __abs__(self):
+        return Money(abs(self.pence))
+
+    def __bool__(self):
+        return self.pence != 0
+
+    def __eq__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.pence == other.pence
+
+    def __lt__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.pence < other.pence
+
+    def __hash__(self):
+        return hash(self.pence)
+
+    def __float__(self):
+        # pence / 100 is the float closest to the decimal amount, so it prints as "12.34"
+        return self.pence / 100
+
+    def decimal(self):
+        return Decimal(self.pence) / PENCE
+
+    def __str__(self):
+        sign = '-' if self.pence < 0 else ''
+        pounds, pence = divmod(abs(self.pence), 100)
+        return f'{sign}{pounds}.{pence:02d}'
+
+    def __format__(self, spec):
+        return format(self.decimal(), spec) if spec else str(self)
+
+    def __repr__(self):
+        return f"Money('{self}')"
+
+    def __reduce__(self):
+        return (Money, (self.pence,))
+
+
+class MoneyType(TypeDecorator):
+    """A Money column, stored as BIGINT pence"""
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, Money):
+            raise TypeError(f'Expected Money, got {value!r}')
+        return value.pence
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else Money(value)
+
+    def coerce_compared_value(self, op, value):
+        # Plain numbers in SQL expressions (e.g. "amount > 0") are pence, not Money
+        return self if isinstance(value, Money) else self.impl_instance
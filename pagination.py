@@ -0,0 +1,62 @@
+import base64
+import binascii
+from datetime import date
+
+from sqlalchemy import tuple_
+
+from models import Transaction
+
+
+def encode_cursor(transaction):
+    """Encode the (date, id) position of a transaction as an opaque cursor string"""
+    raw = f"{transaction.date.isoformat()}:{transaction.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor created by encode_cursor into a (date, id) tuple.
+
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        date_str, id_str = raw.split(':', 1)
+        return date.fromisoformat(date_str), int(id_str)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from e
+
+
+def _newest_first(query, limit):
+    return query.order_by(Transaction.date.desc(), Transaction.id.desc()).limit(limit).all()
+
+
+def paginate_transactions(query, cursor=None, per_page=50, recent_since=None):
+    """Return one page of transactions ordered newest first, plus the cursor for the next page.
+
+    Pages are addressed by the (date, id) of the last row already seen rather than
+    by an OFFSET, so every page costs the same index range scan however deep it is.
+
+    With recent_since, a page that starts on or after that date is first read from
+    rows dated since then, which on a date-partitioned table only scans the recent
+    partitions. Older rows are read with a second query only when the recent ones
+    do not fill the page.
+    """
+    cursor_date = None
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Transaction.date, Transaction.id) < tuple_(cursor_date, cursor_id))
+
+    if recent_since is not None and (cursor_date is None or cursor_date >= recent_since):
+        rows = _newest_first(query.filter(Transaction.date >= recent_since), per_page + 1)
+        if len(rows) <= per_page:
+            rows += _newest_first(query.filter(Transaction.date < recent_since), per_page + 1 - len(rows))
+    else:
+        rows = _newest_first(query, per_page + 1)
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1])
+
+    return rows, next_cursor
@@ -0,0 +1,149 @@
+"""Optional range partitioning of transactions by date, on PostgreSQL.
+
+partition_transactions() converts the transactions table in place into a
+table PARTITION BY RANGE (date) with one partition per calendar year
+(transactions_y2024, ...) plus transactions_default for dates outside
+them. Queries bounded by date, such as the dashboard's recent window (see
+pagination.py) and archiving, then only read the partitions they need,
+and years emptied by archive.py are dropped whole instead of vacuumed.
+
+PostgreSQL requires the partition key in the primary key, so the key
+becomes (id, date); ids keep coming from the same sequence. Run the
+conversion again each year, or ahead of time with a larger years_ahead,
+to add the next year's partition; rows that reached the default
+partition in the meantime are moved into it.
+
+SQLite has no partitioning: supported() is False and transactions stays
+one table, which the rest of the app handles the same way.
+"""
+import re
+from datetime import date
+
+from sqlalchemy import text
+
+from models import Transaction, SEARCH_INDEX_DDL
+
+DEFAULT_PARTITION = 'transactions_default'
+
+COLUMNS = 'id, user_id, category_id, description, amount, transaction_type, date, created_at'
+
+
+def supported(connection):
+    return connection.dialect.name == 'postgresql'
+
+
+def is_partitioned(connection):
+    if not supported(connection):
+        return False
+    return connection.execute(text(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass('transactions')")).scalar() == 'p'
+
+
+def partition_name(year):
+    return f'transactions_y{year}'
+
+
+def year_partitions(connection):
+    """Sorted (year, partition name) pairs of the yearly partitions"""
+    names = connection.execute(text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass('transactions')
+    """)).scalars()
+    return sorted((int(match.group(1)), name) for name in names
+                  if (match := re.fullmatch(r'transactions_y(\d{4})', name)))
+
+
+def _bounds(year):
+    return f"FROM ('{year:04d}-01-01') TO ('{year + 1:04d}-01-01')"
+
+
+def _convert(connection, years, log):
+    sequence = connection.execute(text("SELECT pg_get_serial_sequence('transactions', 'id')")).scalar()
+    connection.execute(text("LOCK TABLE transactions IN ACCESS EXCLUSIVE MODE"))
+    connection.execute(text(f"""
+        CREATE TABLE transactions_partitioned (
+            id INTEGER NOT NULL DEFAULT nextval('{sequence}'::regclass),
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            category_id INTEGER NOT NULL REFERENCES categories (id),
+            description VARCHAR(200) NOT NULL,
+            amount BIGINT NOT NULL,
+            transaction_type VARCHAR(10) NOT NULL,
+            date DATE NOT NULL,
+            created_at TIMESTAMP,
+            CONSTRAINT transactions_partitioned_pkey PRIMARY KEY (id, date)
+        ) PARTITION BY RANGE (date)
+    """))
+    connection.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF transactions_partitioned DEFAULT"))
+    for year in years:
+        connection.execute(text(
+            f"CREATE TABLE {partition_name(year)} PARTITION OF transactions_partitioned FOR VALUES {_bounds(year)}"))
+
+    copied = connection.execute(text(
+        f"INSERT INTO transactions_partitioned ({COLUMNS}) SELECT {COLUMNS} FROM transactions")).rowcount
+    log(f"  copied {copied} transaction(s) into {len(years)} yearly partition(s)")
+
+    # Keep the sequence when the old table is dropped
+    connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY transactions_partitioned.id"))
+    connection.execute(text("DROP TABLE transactions"))
+    connection.execute(text("ALTER TABLE transactions_partitioned RENAME TO transactions"))
+    connection.execute(text("ALTER TABLE transactions RENAME CONSTRAINT transactions_partitioned_pkey TO transactions_pkey"))
+
+    # Indexes on the parent are created on every partition, present and future
+    for index in Transaction.__table__.indexes:
+        index.create(connection)
+    for statement in SEARCH_INDEX_DDL['postgresql']:
+        connection.execute(text(statement))
+
+
+def _add_year(connection, year):
+    """Create one yearly partition, moving its rows out of the default partition first"""
+    name = partition_name(year)
+    params = {'start': date(year, 1, 1), 'end': date(year + 1, 1, 1)}
+    connection.execute(text(f"CREATE TABLE {name} (LIKE transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    connection.execute(text(f"""
+        WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE date >= :start AND date < :end RETURNING {COLUMNS})
+        INSERT INTO {name} ({COLUMNS}) SELECT {COLUMNS} FROM moved
+    """), params)
+    connection.execute(text(f"ALTER TABLE transactions ATTACH PARTITION {name} FOR VALUES {_bounds(year)}"))
+
+
+def partition_transactions(connection, years_ahead=1, log=print):
+    """Partition transactions by year, converting the table if needed; returns the partitions created.
+
+    Covers every year from the oldest transaction to years_ahead after this one.
+    Runs in the caller's transaction, which should be its own: the conversion
+    locks the table while it copies every row.
+    """
+    if not supported(connection):
+        raise RuntimeError(f'Range partitioning needs PostgreSQL, not {connection.dialect.name}')
+
+    oldest = connection.execute(text("SELECT MIN(date) FROM transactions")).scalar()
+    first_year = oldest.year if oldest else date.today().year
+    wanted = range(first_year, date.today().year + years_ahead + 1)
+
+    if not is_partitioned(connection):
+        log("Converting transactions into a partitioned table...")
+        _convert(connection, list(wanted), log)
+        return [partition_name(year) for year in wanted]
+
+    existing = {year for year, _ in year_partitions(connection)}
+    created = []
+    for year in wanted:
+        if year not in existing:
+            _add_year(connection, year)
+            created.append(partition_name(year))
+    return created
+
+
+def drop_empty_partitions(connection, before):
+    """Drop the yearly partitions that end on or before the given date and hold no rows"""
+    if not is_partitioned(connection):
+        return []
+    dropped = []
+    for year, name in year_partitions(connection):
+        if date(year + 1, 1, 1) > before:
+            break
+        if connection.execute(text(f"SELECT NOT EXISTS (SELECT 1 FROM {name})")).scalar():
+            connection.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    return dropped
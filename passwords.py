@@ -0,0 +1,109 @@
+"""Password hashing policy and an off-thread hashing pool.
+
+The werkzeug KDF is deliberately slow. Hashes and verifications run on a
+small process pool so they neither block other threads of a gthread/gevent
+worker nor hold the GIL, and the number of queued and running jobs is
+capped, counting jobs whose caller timed out until they finish: when the
+pool is saturated, HashingPoolSaturated is raised straight away and the app
+answers 503 instead of stalling every other request behind a login burst.
+
+Hashes made under an older policy are reported by needs_rehash() so they
+can be upgraded on the next successful login.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+
+class HashingPoolSaturated(Exception):
+    """Raised when too many hash/verify jobs are already queued"""
+
+
+_settings = {
+    'method': DEFAULT_METHOD,
+    'workers': 0,
+    'queue_limit': 8,
+    'timeout': 10.0,
+}
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(_settings['queue_limit'])
+
+
+def configure(method=DEFAULT_METHOD, workers=0, queue_limit=8, timeout=10.0):
+    """Set the hashing policy; workers=0 hashes inline on the calling thread"""
+    global _slots
+    shutdown()
+    _settings.update(method=method, workers=workers, queue_limit=queue_limit, timeout=timeout)
+    _slots = threading.BoundedSemaphore(queue_limit)
+
+
+def init_app(app):
+    configure(method=app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+              workers=app.config.get('PASSWORD_HASH_WORKERS', 0),
+              queue_limit=app.config.get('PASSWORD_HASH_QUEUE_LIMIT', 8),
+              timeout=app.config.get('PASSWORD_HASH_TIMEOUT', 10.0))
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _get_pool():
+    """Return this process's pool, creating it on first use (and again after a fork)"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # fork avoids re-importing the caller's __main__ (spawn/forkserver would re-run
+            # scripts such as init_db.py); the children only ever run the werkzeug KDF
+            method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = ProcessPoolExecutor(max_workers=_settings['workers'],
+                                        mp_context=multiprocessing.get_context(method))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _run(fn, *args):
+    if not _settings['workers']:
+        return fn(*args)
+
+    slots = _slots
+    if not slots.acquire(blocking=False):
+        raise HashingPoolSaturated()
+    try:
+        future = _get_pool().submit(fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    # The slot is held until the job finishes or is cancelled, not until we stop waiting:
+    # a timed-out job that already started keeps running and still counts against the limit
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=_settings['timeout'])
+    except TimeoutError:
+        future.cancel()
+        raise HashingPoolSaturated()
+
+
+def hash_password(password):
+    """Hash a password with the current policy"""
+    return _run(generate_password_hash, password, _settings['method'])
+
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """True if the hash was made with a different method or cost than the current policy"""
+    return password_hash.split('$', 1)[0] != _settings['method']
@@ -0,0 +1,125 @@
+"""On-demand sampling profiler for single requests.
+
+Opt-in: nothing is profiled unless PROFILER_TOKEN is set. A request that
+carries the same value in an X-Profile-Token header is profiled: a
+background thread samples the request thread's Python stack every
+PROFILER_INTERVAL_MS while the view runs, and the samples are written to
+PROFILE_DIR in collapsed-stack format ("outer;inner;leaf count" per line),
+which flamegraph.pl, speedscope and inferno read directly. The response
+names the file in an X-Profile header.
+
+One request per worker is profiled at a time. Sampling reads other
+threads' frames, so it needs sync or gthread workers; under gevent every
+greenlet shares one thread and the samples are not meaningful.
+"""
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import g, request
+
+
+def frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """Counts the distinct stacks of one thread, sampled at a fixed interval"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+
+def collapsed(samples):
+    """Samples as collapsed stack lines, the input format of flame graph tools"""
+    return ''.join(f'{stack} {count}\n' for stack, count in samples.most_common())
+
+
+class RequestProfiler:
+    def __init__(self):
+        self.token = None
+        self.directory = 'profiles'
+        self.interval = 0.005
+        self._busy = threading.Lock()
+
+    def init_app(self, app):
+        self.token = app.config.get('PROFILER_TOKEN') or None
+        self.directory = app.config.get('PROFILE_DIR', 'profiles')
+        self.interval = app.config.get('PROFILER_INTERVAL_MS', 5) / 1000
+        if not self.token:
+            return
+
+        app.before_request(self._start)
+        app.after_request(self._stop_and_report)
+        app.teardown_request(self._stop_on_error)
+
+    def _requested(self):
+        supplied = request.headers.get('X-Profile-Token')
+        return supplied is not None and hmac.compare_digest(supplied, self.token)
+
+    def _start(self):
+        if not self._requested() or not self._busy.acquire(blocking=False):
+            return
+        g.profile_sampler = StackSampler(threading.get_ident(), self.interval)
+        g.profile_started = time.perf_counter()
+        g.profile_sampler.start()
+
+    def _stop(self):
+        sampler = g.pop('profile_sampler', None)
+        if sampler is None:
+            return None
+        try:
+            samples = sampler.stop()
+            elapsed = time.perf_counter() - g.pop('profile_started')
+            endpoint = re.sub(r'[^\w.-]', '_', request.endpoint or 'unmatched')
+            name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{endpoint}-{os.getpid()}.folded"
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, name), 'w') as f:
+                f.write(collapsed(samples))
+            return f'{name}; samples={sum(samples.values())}; dur={elapsed * 1000:.1f}'
+        finally:
+            self._busy.release()
+
+    def _stop_and_report(self, response):
+        report = self._stop()
+        if report:
+            response.headers['X-Profile'] = report
+            # A profiled response must not be served to anyone else from a cache
+            response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    def _stop_on_error(self, exc):
+        # after_request does not run when the view raised
+        self._stop()
+
+
+request_profiler = RequestProfiler()
@@ -0,0 +1,115 @@
+"""EXPLAIN-based check that the app's hot queries can be answered from an index.
+
+Each query is explained with sequential scans discouraged (PostgreSQL) so that
+a small development table does not hide a missing index; any plan that still
+falls back to a full scan of an application table is reported.
+"""
+import json
+
+from sqlalchemy import func, text
+
+from models import db, Category, MonthlySummary, Transaction
+
+APP_TABLES = ('users', 'categories', 'transactions', 'transactions_archive', 'monthly_summary')
+
+
+def app_queries(user_id=1, category_id=1, dialect_name=None):
+    """Return (name, statement) pairs for the queries the routes issue on every page load"""
+    from app import build_transaction_query
+    from search import apply_search
+
+    queries = []
+    for filter_type in ('all', 'income', 'expense'):
+        for category_filter in ('all', str(category_id)):
+            query = build_transaction_query(user_id, filter_type, category_filter)
+            query = query.order_by(Transaction.date.desc(), Transaction.id.desc()).limit(51)
+            queries.append((f'dashboard listing (filter={filter_type}, category={category_filter})', query.statement))
+    queries.append(('dashboard listing (recent window)', recent_window_listing(user_id)))
+
+    dialect_name = dialect_name or db.engine.dialect.name
+    search = apply_search(build_transaction_query(user_id, 'all', 'all'), ['tesco'], dialect_name).limit(51)
+    queries.append(('description search', search.statement))
+
+    queries.append(('dashboard totals', db.select(func.sum(MonthlySummary.total)).where(
+        MonthlySummary.user_id == user_id).group_by(MonthlySummary.transaction_type)))
+    queries.append(('user categories', db.select(Category).where(
+        Category.user_id == user_id).order_by(Category.name)))
+    queries.append(('category name lookup', db.select(Category).where(
+        Category.user_id == user_id, Category.name == 'Groceries')))
+    queries.append(('categories with transaction counts', db.select(
+        Category, func.sum(MonthlySummary.transaction_count)).outerjoin(
+        MonthlySummary, (MonthlySummary.user_id == Category.user_id) & (MonthlySummary.category_id == Category.id)).where(
+        Category.user_id == user_id).group_by(Category.id).order_by(Category.name)))
+    queries.append(('category transaction count', db.select(func.sum(MonthlySummary.transaction_count)).where(
+        MonthlySummary.user_id == user_id, MonthlySummary.category_id == category_id)))
+    return queries
+
+
+def recent_window_listing(user_id=1, months=12):
+    """The dashboard's first-page query over its recent window (see pagination.py)"""
+    from app import build_transaction_query
+    from archive import month_start
+    query = build_transaction_query(user_id, 'all', 'all').filter(Transaction.date >= month_start(months))
+    return query.order_by(Transaction.date.desc(), Transaction.id.desc()).limit(51).statement
+
+
+def _plan_nodes(connection, sql):
+    plan = connection.execute(text(f'EXPLAIN (FORMAT JSON) {sql}')).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        yield node
+        nodes.extend(node.get('Plans', []))
+
+
+def scanned_partitions(engine, statement):
+    """Names of the transactions partitions a query reads after partition pruning (PostgreSQL)"""
+    import partitioning
+    sql = statement.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True})
+    with engine.connect() as connection:
+        partitions = {name for _, name in partitioning.year_partitions(connection)} | {partitioning.DEFAULT_PARTITION}
+        return sorted({node['Relation Name'] for node in _plan_nodes(connection, sql)
+                       if node.get('Relation Name') in partitions})
+
+
+def _postgresql_full_scans(connection, sql):
+    connection.execute(text('SET LOCAL enable_seqscan = off'))
+    scans = []
+    for node in _plan_nodes(connection, sql):
+        relation = node.get('Relation Name', '')
+        # Partitions of a partitioned transactions table are named transactions_*
+        if node.get('Node Type') == 'Seq Scan' and (relation in APP_TABLES or relation.startswith('transactions_')):
+            scans.append(f"Seq Scan on {relation}")
+    return scans
+
+
+def _sqlite_full_scans(connection, sql):
+    scans = []
+    for row in connection.execute(text(f'EXPLAIN QUERY PLAN {sql}')):
+        detail = row[-1]
+        words = detail.split()
+        # "SEARCH t USING INDEX ..." is an index lookup, "SCAN t [USING ...]" reads every row
+        if len(words) >= 2 and words[0] == 'SCAN' and words[1] in APP_TABLES:
+            scans.append(detail)
+    return scans
+
+
+def check_query_plans(engine, user_id=1, category_id=1):
+    """Explain every app query and return {query name: [full scan descriptions]} for the offenders"""
+    explain = {
+        'postgresql': _postgresql_full_scans,
+        'sqlite': _sqlite_full_scans,
+    }.get(engine.dialect.name)
+    if explain is None:
+        raise RuntimeError(f'Query plan check is not supported on {engine.dialect.name}')
+
+    problems = {}
+    for name, statement in app_queries(user_id, category_id, engine.dialect.name):
+        sql = statement.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True})
+        with engine.begin() as connection:
+            scans = explain(connection, sql)
+        if scans:
+            problems[name] = scans
+    return problems
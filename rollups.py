@@ -0,0 +1,247 @@
+"""Incremental maintenance of the monthly_summary rollup.
+
+Every change to a transaction is applied to the rollup as a delta in the
+same database transaction, so reports read O(months x categories) rows
+instead of scanning every transaction. rebuild() recomputes the rollup
+from the raw rows, live and archived, and verify() checks that the two agree.
+"""
+from collections import defaultdict
+
+from sqlalchemy import func, literal, text, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Category, MonthlySummary
+from money import Money
+
+KEY_COLUMNS = ('user_id', 'category_id', 'year_month', 'transaction_type')
+
+
+def year_month(value):
+    return value.strftime('%Y-%m')
+
+
+def year_month_sql(dialect_name):
+    """SQL expression for the 'YYYY-MM' of transactions.date on the given dialect"""
+    if dialect_name == 'postgresql':
+        return "to_char(date, 'YYYY-MM')"
+    return "strftime('%Y-%m', date)"
+
+
+def _year_month_expression(column, dialect_name):
+    if dialect_name == 'postgresql':
+        return func.to_char(column, 'YYYY-MM')
+    return func.strftime('%Y-%m', column)
+
+
+def snapshot(transaction):
+    """Capture the fields of a transaction that the rollup depends on, before it is edited"""
+    return (transaction.user_id, transaction.category_id, transaction.date,
+            transaction.transaction_type, transaction.amount)
+
+
+def apply_delta(user_id, category_id, year_month, transaction_type, amount, count):
+    """Add amount and count to one rollup row, creating it or removing it when it empties"""
+    values = dict(user_id=user_id, category_id=category_id, year_month=year_month,
+                  transaction_type=transaction_type, total=amount, transaction_count=count)
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        insert = (postgresql if dialect == 'postgresql' else sqlite).insert(MonthlySummary).values(**values)
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=KEY_COLUMNS,
+            set_={
+                'total': MonthlySummary.total + insert.excluded.total,
+                'transaction_count': MonthlySummary.transaction_count + insert.excluded.transaction_count,
+            }
+        ))
+    else:
+        updated = db.session.execute(db.update(MonthlySummary).where(*_key_filter(values)).values(
+            total=MonthlySummary.total + amount,
+            transaction_count=MonthlySummary.transaction_count + count,
+        ))
+        if updated.rowcount == 0:
+            db.session.execute(db.insert(MonthlySummary).values(**values))
+
+    if count < 0:
+        db.session.execute(db.delete(MonthlySummary).where(
+            *_key_filter(values), MonthlySummary.transaction_count <= 0))
+
+
+def _key_filter(values):
+    return [getattr(MonthlySummary, column) == values[column] for column in KEY_COLUMNS]
+
+
+def record_added(transaction):
+    apply_delta(transaction.user_id, transaction.category_id, year_month(transaction.date),
+                transaction.transaction_type, transaction.amount, 1)
+
+
+def record_removed(transaction):
+    apply_delta(transaction.user_id, transaction.category_id, year_month(transaction.date),
+                transaction.transaction_type, -transaction.amount, -1)
+
+
+def record_changed(before, transaction):
+    """Move a transaction's contribution from its snapshot() before an edit to its current values"""
+    user_id, category_id, txn_date, transaction_type, amount = before
+    if before == snapshot(transaction):
+        return
+    apply_delta(user_id, category_id, year_month(txn_date), transaction_type, -amount, -1)
+    record_added(transaction)
+
+
+class DeltaBatch:
+    """Accumulates rollup deltas for many inserted rows and applies them with one statement per key"""
+
+    def __init__(self):
+        self.deltas = defaultdict(lambda: [Money(0), 0])
+
+    def add(self, values):
+        key = (values['user_id'], values['category_id'], year_month(values['date']), values['transaction_type'])
+        self.deltas[key][0] += values['amount']
+        self.deltas[key][1] += 1
+
+    def apply(self):
+        for (user_id, category_id, ym, transaction_type), (amount, count) in self.deltas.items():
+            apply_delta(user_id, category_id, ym, transaction_type, amount, count)
+        self.deltas.clear()
+
+
+def _add_selected(select):
+    """Add the (key columns..., total, count) rows of a SELECT to the rollup, with one statement where possible"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in ('postgresql', 'sqlite'):
+        for row in db.session.execute(select).all():
+            apply_delta(*row)
+        return
+
+    from sqlalchemy.dialects import postgresql, sqlite
+    insert = (postgresql if dialect == 'postgresql' else sqlite).insert(MonthlySummary).from_select(
+        [*KEY_COLUMNS, 'total', 'transaction_count'], select)
+    db.session.execute(insert.on_conflict_do_update(
+        index_elements=KEY_COLUMNS,
+        set_={
+            'total': MonthlySummary.total + insert.excluded.total,
+            'transaction_count': MonthlySummary.transaction_count + insert.excluded.transaction_count,
+        }
+    ))
+
+
+def record_bulk_change(model, conditions, **changes):
+    """Apply a bulk UPDATE or DELETE of the model's rows matching conditions; call it before the statement runs.
+
+    With changes (new category_id and/or transaction_type) the rows' totals move
+    to the keys the UPDATE gives them, and rows that already have those values
+    are left out. Without changes they are removed, as for a DELETE. Only the
+    selected rows are read, grouped in one statement. Call prune() afterwards.
+    """
+    dialect = db.session.get_bind().dialect.name
+    keys = dict(zip(KEY_COLUMNS, (model.user_id, model.category_id,
+                                  _year_month_expression(model.date, dialect), model.transaction_type)))
+    conditions = [*conditions, *(getattr(model, column) != value for column, value in changes.items())]
+
+    removed = db.select(*keys.values(), -func.sum(model.amount), -func.count()).where(
+        *conditions).group_by(*keys.values())
+    if not changes:
+        _add_selected(removed)
+        return
+
+    # The changed columns are constants here, so grouping by the others gives one row per new key.
+    # The new keys never collide with the removed ones, as their changed columns differ.
+    new_keys = [literal(changes[column], getattr(model, column).type) if column in changes else expression
+                for column, expression in keys.items()]
+    added = db.select(*new_keys, func.sum(model.amount), func.count()).where(*conditions).group_by(
+        *(expression for column, expression in keys.items() if column not in changes))
+    _add_selected(union_all(removed, added))
+
+
+def move_category(user_id, from_category_id, to_category_id):
+    """Move a category's rollup rows onto another category, once every one of its transactions was moved there"""
+    _add_selected(db.select(
+        MonthlySummary.user_id, literal(to_category_id, MonthlySummary.category_id.type),
+        MonthlySummary.year_month, MonthlySummary.transaction_type,
+        MonthlySummary.total, MonthlySummary.transaction_count,
+    ).where(MonthlySummary.user_id == user_id, MonthlySummary.category_id == from_category_id))
+    db.session.execute(db.delete(MonthlySummary).where(
+        MonthlySummary.user_id == user_id, MonthlySummary.category_id == from_category_id))
+
+
+def prune(user_id):
+    """Drop the user's rollup rows that bulk changes have emptied"""
+    db.session.execute(db.delete(MonthlySummary).where(
+        MonthlySummary.user_id == user_id, MonthlySummary.transaction_count <= 0))
+
+
+def _grouped_transactions_sql(dialect_name, user_id=None):
+    # Archived transactions (see archive.py) count towards the rollup like live ones
+    where = 'WHERE user_id = :user_id' if user_id is not None else ''
+    columns = 'user_id, category_id, date, transaction_type, amount'
+    return f"""
+        SELECT user_id, category_id, {year_month_sql(dialect_name)} AS year_month, transaction_type,
+               SUM(amount) AS total, COUNT(*) AS transaction_count
+        FROM (SELECT {columns} FROM transactions {where}
+              UNION ALL SELECT {columns} FROM transactions_archive {where}) AS t
+        GROUP BY user_id, category_id, {year_month_sql(dialect_name)}, transaction_type
+    """
+
+
+def rebuild(user_id=None):
+    """Recompute the rollup from the transactions table for one user, or everyone"""
+    dialect = db.session.get_bind().dialect.name
+    params = {'user_id': user_id} if user_id is not None else {}
+
+    delete = db.delete(MonthlySummary)
+    if user_id is not None:
+        delete = delete.where(MonthlySummary.user_id == user_id)
+    db.session.execute(delete)
+    db.session.execute(text(
+        f"INSERT INTO monthly_summary ({', '.join(KEY_COLUMNS)}, total, transaction_count) "
+        + _grouped_transactions_sql(dialect, user_id)
+    ), params)
+
+
+def verify(user_id=None):
+    """Compare the rollup with the raw transactions; returns a list of mismatch descriptions"""
+    dialect = db.session.get_bind().dialect.name
+    params = {'user_id': user_id} if user_id is not None else {}
+
+    expected = {tuple(row[:4]): (Money(row[4]), row[5]) for row in db.session.execute(
+        text(_grouped_transactions_sql(dialect, user_id)), params)}
+
+    query = db.select(MonthlySummary)
+    if user_id is not None:
+        query = query.where(MonthlySummary.user_id == user_id)
+    actual = {(s.user_id, s.category_id, s.year_month, s.transaction_type): (s.total, s.transaction_count)
+              for s in db.session.scalars(query)}
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual), key=str):
+        want = expected.get(key, (Money(0), 0))
+        got = actual.get(key, (Money(0), 0))
+        if want != got:
+            mismatches.append(f"{key}: expected total={want[0]} count={want[1]}, "
+                              f"rollup has total={got[0]} count={got[1]}")
+    return mismatches
+
+
+def report_rows(user_id, since_year_month):
+    """Rollup rows for a user from since_year_month onwards, with category names"""
+    return db.session.execute(
+        db.select(MonthlySummary.year_month, MonthlySummary.transaction_type, Category.id, Category.name,
+                  MonthlySummary.total, MonthlySummary.transaction_count)
+        .join(Category, Category.id == MonthlySummary.category_id)
+        .where(MonthlySummary.user_id == user_id, MonthlySummary.year_month >= since_year_month)
+        .order_by(MonthlySummary.year_month)
+    ).all()
+
+
+def totals(user_id):
+    """Return (total_income, total_expenses, balance) as Money, summed in SQL over the user's rollup rows"""
+    sums = dict(db.session.execute(
+        db.select(MonthlySummary.transaction_type, func.sum(MonthlySummary.total))
+        .where(MonthlySummary.user_id == user_id)
+        .group_by(MonthlySummary.transaction_type)
+    ).all())
+    total_income = sums.get('income') or Money(0)
+    total_expenses = sums.get('expense') or Money(0)
+    return total_income, total_expenses, total_income - total_expenses
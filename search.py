@@ -0,0 +1,84 @@
+"""Full-text search over transaction descriptions.
+
+PostgreSQL matches to_tsvector('simple', description) against a prefix
+tsquery, answered by the GIN expression index and ranked with ts_rank.
+SQLite matches the transactions_fts FTS5 table (kept in sync with
+transactions by triggers) and ranks by bm25. The index definitions live
+with the models and in migration 5.
+
+Every search word is matched as a prefix, so "tes" finds "Tesco". Results
+are ordered by relevance, then newest first. Relevance has no stable
+keyset, so search pages are addressed by an offset cursor; search result
+sets are small compared with a user's full history.
+"""
+import base64
+import binascii
+import re
+
+from sqlalchemy import func, literal_column, table, column
+
+from models import db, Transaction
+
+TS_CONFIG = literal_column("'simple'::regconfig")
+MAX_TERMS = 8
+
+transactions_fts = table('transactions_fts', column('rowid'), column('rank'))
+
+
+def search_terms(text):
+    """Lower-cased words of a search string; punctuation is ignored"""
+    return re.findall(r'\w+', text.lower())[:MAX_TERMS]
+
+
+def apply_search(query, terms, dialect_name):
+    """Restrict a Transaction query to rows matching every term, ordered by relevance"""
+    if dialect_name == 'postgresql':
+        vector = func.to_tsvector(TS_CONFIG, Transaction.description)
+        tsquery = func.to_tsquery(TS_CONFIG, ' & '.join(f'{term}:*' for term in terms))
+        return query.filter(vector.op('@@')(tsquery)).order_by(
+            func.ts_rank(vector, tsquery).desc(), Transaction.date.desc(), Transaction.id.desc())
+
+    if dialect_name == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return query.join(transactions_fts, transactions_fts.c.rowid == Transaction.id).filter(
+            literal_column('transactions_fts').op('MATCH')(match)
+        ).order_by(transactions_fts.c.rank, Transaction.date.desc(), Transaction.id.desc())
+
+    # No text index on other databases: an unranked substring match
+    for term in terms:
+        query = query.filter(Transaction.description.ilike(f'%{term}%'))
+    return query.order_by(Transaction.date.desc(), Transaction.id.desc())
+
+
+def encode_cursor(offset):
+    return base64.urlsafe_b64encode(f'search:{offset}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor created by encode_cursor into an offset. Raises ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        prefix, offset = base64.urlsafe_b64decode(padded.encode()).decode().split(':', 1)
+        if prefix != 'search' or int(offset) < 0:
+            raise ValueError
+        return int(offset)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from e
+
+
+def search_transactions(query, text, cursor=None, per_page=50):
+    """Return one page of the query's transactions matching text, best match first, plus the next cursor"""
+    terms = search_terms(text)
+    if not terms:
+        return [], None
+
+    offset = decode_cursor(cursor) if cursor else 0
+    dialect_name = db.session.get_bind(mapper=Transaction).dialect.name
+    rows = apply_search(query, terms, dialect_name).offset(offset).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(offset + per_page)
+
+    return rows, next_cursor
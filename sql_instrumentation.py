@@ -0,0 +1,157 @@
+"""Request-scoped SQL instrumentation.
+
+Every statement executed on any SQLAlchemy engine is timed and recorded in
+the collectors active on the current thread. A collector is opened for
+each request, and its totals are reported in a Server-Timing header and a
+debug log line. count_queries() and assert_within_budget() open their own
+collectors so tests can check how many statements a block or route issues.
+"""
+import heapq
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class QueryStats:
+    """Statement count, total time and the slowest statements seen by one collector"""
+
+    def __init__(self, keep_slowest=3):
+        self.count = 0
+        self.total_time = 0.0
+        self.statements = []
+        self._keep_slowest = keep_slowest
+        self._slowest = []
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.total_time += duration
+        self.statements.append(statement)
+        entry = (duration, self.count, statement)
+        if len(self._slowest) < self._keep_slowest:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    @property
+    def slowest(self):
+        """(duration, statement) pairs, slowest first"""
+        return [(duration, statement) for duration, _, statement in sorted(self._slowest, reverse=True)]
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _collectors():
+    if not hasattr(_local, 'collectors'):
+        _local.collectors = []
+    return _local.collectors
+
+
+@contextmanager
+def count_queries(keep_slowest=3):
+    """Collect statistics for every statement executed on this thread inside the block"""
+    stats = QueryStats(keep_slowest)
+    collectors = _collectors()
+    collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        collectors.remove(stats)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info['query_start'].pop()
+    for stats in _collectors():
+        stats.record(statement, duration)
+
+
+def query_budget(max_queries):
+    """Declare the most statements a view may issue per request.
+
+    The budget is for the worst case: the page cache missing and the
+    logged-in user not yet in the user loader cache. Place directly under
+    @app.route so the registered view carries the budget;
+    tests/test_query_budgets.py checks every budgeted route against it.
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def assert_within_budget(client, path, method='GET', **kwargs):
+    """Request path with a Flask test client and fail if the route exceeds its declared budget.
+
+    Returns the response so callers can make further assertions on it.
+    """
+    app = client.application
+    adapter = app.url_map.bind('localhost')
+    endpoint, _ = adapter.match(path.split('?', 1)[0], method=method)
+    budget = getattr(app.view_functions[endpoint], 'query_budget', None)
+    if budget is None:
+        raise ValueError(f'Route {endpoint!r} has no declared query budget')
+
+    with count_queries() as stats:
+        response = client.open(path, method=method, **kwargs)
+
+    if stats.count > budget:
+        listing = '\n'.join(f'  {statement}' for statement in stats.statements)
+        raise QueryBudgetExceeded(
+            f'{method} {path} ({endpoint}) issued {stats.count} queries, budget is {budget}:\n{listing}')
+    return response
+
+
+def init_app(app):
+    """Collect per-request SQL statistics and report them on each response"""
+    if not app.config.get('SQL_INSTRUMENTATION', True):
+        return
+
+    keep_slowest = app.config.get('SQL_SLOWEST_STATEMENTS', 3)
+
+    @app.before_request
+    def _start_sql_stats():
+        g.sql_stats = QueryStats(keep_slowest)
+        _collectors().append(g.sql_stats)
+
+    @app.after_request
+    def _report_sql_stats(response):
+        stats = g.get('sql_stats')
+        if stats is None:
+            return response
+
+        response.headers.add('Server-Timing', f'db;desc="{stats.count} queries";dur={stats.total_time * 1000:.2f}')
+
+        if logger.isEnabledFor(logging.DEBUG):
+            slowest = '; '.join(f'{duration * 1000:.1f} ms {" ".join(statement.split())[:120]}'
+                                for duration, statement in stats.slowest)
+            logger.debug('%s %s: %d queries, %.1f ms in DB; slowest: %s',
+                         request.method, request.path, stats.count, stats.total_time * 1000, slowest or '-')
+
+        budget = getattr(app.view_functions.get(request.endpoint), 'query_budget', None)
+        if budget is not None and stats.count > budget:
+            logger.warning('%s %s issued %d queries, over its budget of %d',
+                           request.method, request.path, stats.count, budget)
+        return response
+
+    @app.teardown_request
+    def _stop_sql_stats(exc):
+        stats = g.pop('sql_stats', None)
+        collectors = _collectors()
+        if stats in collectors:
+            collectors.remove(stats)
@@ -0,0 +1,39 @@
+// JSON requests to the mutation API. The CSRF token comes from the page's
+// csrf-token meta tag and is sent in the X-CSRFToken header that CSRFProtect checks.
+function apiRequest(method, url, body) {
+  const csrfToken = document.querySelector('meta[name="csrf-token"]').content;
+  return fetch(url, {
+    method: method,
+    headers: {
+      'Content-Type': 'application/json',
+      'Accept': 'application/json',
+      'X-CSRFToken': csrfToken
+    },
+    credentials: 'same-origin',
+    body: body === undefined ? undefined : JSON.stringify(body)
+  }).then(function(response) {
+    return response.json().catch(function() {
+      return {};
+    }).then(function(data) {
+      if (!response.ok) {
+        throw new Error(data.error || 'Something went wrong. Please reload the page and try again.');
+      }
+      return data;
+    });
+  });
+}
+
+// Form fields as a plain object, without the hidden csrf_token input
+function formValues(form) {
+  const values = {};
+  new FormData(form).forEach(function(value, key) {
+    if (key !== 'csrf_token') {
+      values[key] = value;
+    }
+  });
+  return values;
+}
+
+function formatMoney(value) {
+  return '£' + Number(value).toFixed(2);
+}
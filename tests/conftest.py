@@ -0,0 +1,109 @@
+"""Shared fixtures: the app on a fresh SQLite database per test, and a logged-in client.
+
+config.py reads the environment when it is imported, so the test database
+and a cheap inline password hash are set up before the app is imported.
+No app context is held across requests: the test client would reuse it,
+and with it the per-request caches in flask.g.
+"""
+import os
+import sys
+import tempfile
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix='finance-tests-'), 'finance.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DATABASE_PATH}'
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+os.environ['RESPONSE_CACHE'] = 'lru'
+os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+for name in ('DATABASE_REPLICA_URL', 'METRICS_DIR', 'USER_CACHE_SIGNAL_FILE', 'PROFILER_TOKEN'):
+    os.environ.pop(name, None)
+
+from app import app as flask_app  # noqa: E402
+from cache import response_cache  # noqa: E402
+from models import db, Category, Transaction, User  # noqa: E402
+from money import Money  # noqa: E402
+from user_cache import user_cache  # noqa: E402
+import migrations  # noqa: E402
+import rollups  # noqa: E402
+
+
+def clear_caches():
+    """Forget cached pages and users, as a fresh worker would"""
+    if response_cache.backend is not None:
+        response_cache.backend.clear()
+    user_cache.clear()
+
+
+@pytest.fixture
+def app():
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with flask_app.app_context():
+        db.engine.dispose()
+        if os.path.exists(DATABASE_PATH):
+            os.remove(DATABASE_PATH)
+        migrations.init_schema(db.engine, log=lambda message: None)
+    clear_caches()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    clear_caches()
+
+
+def add_transaction(user_id, category_id, pence, transaction_type='expense', on=None, description='Groceries'):
+    """Add a transaction and its rollup delta, as the routes do; needs an app context"""
+    transaction = Transaction(user_id=user_id, category_id=category_id, description=description,
+                              amount=Money(pence), transaction_type=transaction_type,
+                              date=on or date.today())
+    db.session.add(transaction)
+    db.session.flush()
+    rollups.record_added(transaction)
+    return transaction
+
+
+@pytest.fixture
+def data(app):
+    """alice with Food (3 transactions, one of them old), Rent (1) and an empty Spare category; bob with Food"""
+    with app.app_context():
+        alice = User(username='alice', email='alice@example.com', password_hash='-')
+        bob = User(username='bob', email='bob@example.com', password_hash='-')
+        db.session.add_all([alice, bob])
+        db.session.flush()
+        food, rent, spare = (Category(user_id=alice.id, name=name) for name in ('Food', 'Rent', 'Spare'))
+        bob_food = Category(user_id=bob.id, name='Food')
+        db.session.add_all([food, rent, spare, bob_food])
+        db.session.flush()
+
+        today = date.today()
+        transactions = [
+            add_transaction(alice.id, food.id, 1250, on=today),
+            add_transaction(alice.id, food.id, 399, on=today, description='Bakery'),
+            add_transaction(alice.id, food.id, 2000, on=date(today.year - 5, 3, 14), description='Old shop'),
+            add_transaction(alice.id, rent.id, 95000, on=today, description='Rent'),
+            add_transaction(alice.id, rent.id, 250000, 'income', on=today, description='Salary'),
+            add_transaction(bob.id, bob_food.id, 700, on=today),
+        ]
+        db.session.commit()
+        return SimpleNamespace(
+            alice=alice.id, bob=bob.id, food=food.id, rent=rent.id, spare=spare.id, bob_food=bob_food.id,
+            transactions=[t.id for t in transactions],
+        )
+
+
+def log_in(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+
+@pytest.fixture
+def client(app, data):
+    """A test client logged in as alice"""
+    client = app.test_client()
+    log_in(client, data.alice)
+    return client
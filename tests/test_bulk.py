@@ -0,0 +1,89 @@
+"""Bulk category moves and transaction selections, and the rollup they maintain"""
+from datetime import date
+
+from models import db, ArchivedTransaction, Category, Transaction
+import archive
+import rollups
+
+
+def rollup_matches(app, user_id):
+    with app.app_context():
+        return rollups.verify(user_id) == []
+
+
+def test_merge_empty_category_invalidates_cached_pages(client, data):
+    client.get('/categories')  # the first render puts a CSRF token in the session, which keys the cache
+    first = client.get('/categories')
+    assert b'Spare' in first.data
+    assert client.get('/categories').headers['X-Cache'] == 'HIT'
+
+    response = client.post(f'/api/categories/{data.spare}/merge', json={'into_category_id': data.food})
+    assert response.status_code == 200
+    assert response.get_json()['moved'] == 0
+
+    page = client.get('/categories')
+    assert page.headers['X-Cache'] == 'MISS'
+    assert b'Spare' not in page.data
+    assert client.get('/categories', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+
+
+def test_merge_moves_transactions_and_rollup(app, client, data):
+    response = client.post(f'/api/categories/{data.food}/merge', json={'into_category_id': data.rent})
+    assert response.get_json()['moved'] == 3
+    with app.app_context():
+        assert db.session.get(Category, data.food) is None
+        assert Transaction.query.filter_by(category_id=data.rent).count() == 5
+    assert rollup_matches(app, data.alice)
+
+
+def test_reassign_includes_archived_transactions(app, client, data):
+    with app.app_context():
+        archive.archive_before(db.engine, archive.month_start(12), log=lambda message: None)
+    response = client.post(f'/api/categories/{data.food}/reassign', json={'to_category_id': data.spare})
+    assert response.get_json()['moved'] == 3
+    assert rollup_matches(app, data.alice)
+
+
+def test_reassign_to_another_users_category_moves_nothing(app, client, data):
+    response = client.post(f'/api/categories/{data.food}/reassign', json={'to_category_id': data.bob_food})
+    assert response.status_code == 400
+    with app.app_context():
+        assert Transaction.query.filter_by(category_id=data.food).count() == 3
+    assert rollup_matches(app, data.alice)
+
+
+def test_bulk_delete_by_date_range_includes_archived_transactions(app, client, data):
+    with app.app_context():
+        assert archive.archive_before(db.engine, archive.month_start(12), log=lambda message: None) == 1
+    today = date.today()
+    response = client.post('/api/transactions/bulk-delete',
+                           json={'start': date(today.year - 6, 1, 1).isoformat(),
+                                 'end': date(today.year - 1, 1, 1).isoformat()})
+    assert response.get_json()['deleted'] == 1
+    assert response.get_json()['totals']['expenses'] == 966.49
+    with app.app_context():
+        assert ArchivedTransaction.query.count() == 0
+    assert rollup_matches(app, data.alice)
+
+
+def test_bulk_retype_and_delete_keep_rollup_exact(app, client, data):
+    before = client.get('/api/transactions').get_json()
+    response = client.post('/api/transactions/bulk-retype',
+                           json={'ids': data.transactions[:2], 'transaction_type': 'income'})
+    assert response.get_json()['changed'] == 2
+    assert rollup_matches(app, data.alice)
+
+    # bob's transaction is not alice's to delete
+    response = client.post('/api/transactions/bulk-delete', json={'ids': data.transactions})
+    assert response.get_json()['deleted'] == 5
+    assert response.get_json()['totals'] == {'income': 0.0, 'expenses': 0.0, 'balance': 0.0}
+    assert rollup_matches(app, data.alice)
+    assert rollup_matches(app, data.bob)
+    assert len(before['transactions']) == 5
+
+
+def test_bulk_selection_must_be_a_list_of_ids(client, data):
+    assert client.post('/api/transactions/bulk-delete', json={'ids': '12'}).status_code == 400
+    assert client.post('/api/transactions/bulk-delete', json=[1]).status_code == 400
+    assert client.post('/api/transactions/bulk-retype',
+                       json={'ids': [True], 'transaction_type': 'income'}).status_code == 400
@@ -0,0 +1,31 @@
+"""Page cache and ETag revalidation of the read-only pages"""
+import time
+
+import cache
+
+
+def test_unchanged_page_is_not_modified(client, data):
+    client.get('/dashboard')  # the first render puts a CSRF token in the session
+    etag = client.get('/dashboard').headers['ETag']
+    assert client.get('/dashboard', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_etag_expires_before_the_embedded_csrf_token(app, client, data, monkeypatch):
+    client.get('/dashboard')
+    etag = client.get('/dashboard').headers['ETag']
+
+    half_lifetime = app.config.get('WTF_CSRF_TIME_LIMIT', 3600) // 2
+    now = time.time()
+    monkeypatch.setattr(cache.time, 'time', lambda: now + half_lifetime)
+
+    response = client.get('/dashboard', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.headers['ETag'] != etag
+
+
+def test_data_change_invalidates_page(client, data):
+    client.get('/dashboard')
+    etag = client.get('/dashboard').headers['ETag']
+    client.delete(f'/api/transactions/{data.transactions[0]}')
+    assert client.get('/dashboard', headers={'If-None-Match': etag}).status_code == 200
@@ -0,0 +1,52 @@
+"""Every route with a @query_budget stays within it, in the worst case.
+
+Each request is made with the page and user caches empty, so the budget
+covers loading the logged-in user and rendering the page from scratch.
+"""
+import pytest
+
+from sql_instrumentation import assert_within_budget
+from conftest import clear_caches
+
+
+def budgeted_requests(data):
+    """(method, path, request kwargs) covering every budgeted endpoint"""
+    today_id = data.transactions[0]
+    new_transaction = {'category_id': data.food, 'description': 'Lunch', 'transaction_type': 'expense',
+                       'amount': '8.50', 'date': '2024-05-01'}
+    return [
+        ('GET', '/dashboard', {}),
+        ('GET', '/dashboard?filter=expense&category=%d' % data.food, {}),
+        ('GET', '/dashboard?q=bakery', {}),
+        ('GET', '/api/transactions', {}),
+        ('GET', '/api/transactions?q=shop', {}),
+        ('GET', '/reports', {}),
+        ('GET', '/categories', {}),
+        ('POST', '/api/transactions', {'json': new_transaction}),
+        ('PUT', f'/api/transactions/{today_id}', {'json': {**new_transaction, 'category_id': data.rent}}),
+        ('DELETE', f'/api/transactions/{today_id}', {}),
+        ('POST', '/api/transactions/bulk-delete', {'json': {'ids': data.transactions[:2]}}),
+        ('POST', '/api/transactions/bulk-retype', {'json': {'ids': data.transactions[:2],
+                                                            'transaction_type': 'income'}}),
+        ('POST', '/api/categories', {'json': {'name': 'Travel'}}),
+        ('PUT', f'/api/categories/{data.spare}', {'json': {'name': 'Savings'}}),
+        ('DELETE', f'/api/categories/{data.spare}', {}),
+        ('POST', f'/api/categories/{data.food}/reassign', {'json': {'to_category_id': data.rent}}),
+        ('POST', f'/api/categories/{data.food}/merge', {'json': {'into_category_id': data.rent}}),
+    ]
+
+
+def test_every_budgeted_route_is_covered(app, data):
+    budgeted = {endpoint for endpoint, view in app.view_functions.items() if hasattr(view, 'query_budget')}
+    adapter = app.url_map.bind('localhost')
+    covered = {adapter.match(path.split('?', 1)[0], method=method)[0]
+               for method, path, _ in budgeted_requests(data)}
+    assert budgeted == covered
+
+
+@pytest.mark.parametrize('index', range(17))
+def test_route_within_budget(client, data, index):
+    method, path, kwargs = budgeted_requests(data)[index]
+    clear_caches()
+    response = assert_within_budget(client, path, method=method, **kwargs)
+    assert response.status_code in (200, 201), response.get_data(as_text=True)[:500]
@@ -0,0 +1,37 @@
+"""The monthly_summary rollup stays equal to the raw transactions under deltas"""
+from datetime import date
+
+from conftest import add_transaction
+from models import db, MonthlySummary, Transaction
+from money import Money
+import rollups
+
+
+def test_deltas_upsert_into_one_row_and_remove_emptied_rows(app, data):
+    with app.app_context():
+        year_month = rollups.year_month(date.today())
+        key = dict(user_id=data.alice, category_id=data.spare, year_month=year_month, transaction_type='expense')
+
+        first = add_transaction(data.alice, data.spare, 500)
+        second = add_transaction(data.alice, data.spare, 250)
+        row = db.session.execute(db.select(MonthlySummary).filter_by(**key)).scalar_one()
+        assert (row.total, row.transaction_count) == (Money(750), 2)
+
+        for transaction in (first, second):
+            rollups.record_removed(transaction)
+            db.session.delete(transaction)
+        db.session.commit()
+        assert db.session.execute(db.select(MonthlySummary).filter_by(**key)).first() is None
+        assert rollups.verify(data.alice) == []
+
+
+def test_edit_moves_contribution(app, data):
+    with app.app_context():
+        transaction = db.session.get(Transaction, data.transactions[0])
+        before = rollups.snapshot(transaction)
+        transaction.category_id = data.rent
+        transaction.transaction_type = 'income'
+        rollups.record_changed(before, transaction)
+        db.session.commit()
+        assert rollups.verify(data.alice) == []
+
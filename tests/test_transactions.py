@@ -0,0 +1,58 @@
+"""Adding and editing transactions through the dashboard forms and the JSON API"""
+from datetime import date
+
+from models import db, Transaction
+from conftest import add_transaction
+
+
+def form(data, **overrides):
+    values = {'category_id': data.food, 'description': 'Cinema', 'transaction_type': 'expense',
+              'amount': '12.00', 'date': date.today().isoformat()}
+    values.update(overrides)
+    return values
+
+
+def test_form_add_rejects_unknown_type(app, client, data):
+    client.post('/transaction/add', data=form(data, transaction_type='refund'))
+    with app.app_context():
+        assert Transaction.query.filter_by(description='Cinema').count() == 0
+    assert client.get('/reports').status_code == 200
+
+
+def test_form_edit_rejects_unknown_type(app, client, data):
+    transaction_id = data.transactions[0]
+    client.post(f'/transaction/edit/{transaction_id}', data=form(data, transaction_type='refund'))
+    with app.app_context():
+        assert db.session.get(Transaction, transaction_id).transaction_type == 'expense'
+
+
+def test_form_add_accepts_valid_transaction(app, client, data):
+    client.post('/transaction/add', data=form(data))
+    with app.app_context():
+        assert Transaction.query.filter_by(description='Cinema').count() == 1
+
+
+def test_reports_skip_rows_of_unknown_type(app, client, data):
+    with app.app_context():
+        add_transaction(data.alice, data.food, 500, 'refund')
+        db.session.commit()
+    response = client.get('/reports')
+    assert response.status_code == 200
+
+
+def test_api_rejects_overlong_description(client, data):
+    body = {'category_id': data.food, 'description': 'x' * 201, 'transaction_type': 'expense',
+            'amount': '1.00', 'date': '2024-01-01'}
+    assert client.post('/api/transactions', json=body).status_code == 400
+    body['description'] = 'x' * 200
+    assert client.post('/api/transactions', json=body).status_code == 201
+
+
+def test_category_endpoints_reject_non_object_bodies(client, data):
+    assert client.post('/api/categories', json=['Travel']).status_code == 400
+    assert client.put(f'/api/categories/{data.spare}', json=['Travel']).status_code == 400
+
+
+def test_non_numeric_category_filter_is_a_bad_request(client, data):
+    assert client.get('/dashboard?category=abc').status_code == 400
+    assert client.get('/api/transactions?category=abc').status_code == 400
@@ -0,0 +1,167 @@
+"""Per-worker cache for the Flask-Login user loader.
+
+load_user runs on every authenticated request. Instead of a full User row
+it returns a small detached UserSnapshot, kept for a short TTL in a
+bounded LRU.
+
+Updating or deleting a User through the ORM drops its entry in this worker
+straight away, and again once the change commits. The commit also touches
+USER_CACHE_SIGNAL_FILE, a file shared by the workers on a host: every
+worker checks its modification time with one stat() per lookup and clears
+its cache when it has moved, so no worker serves a deleted user after the
+delete committed. Instances on other hosts do not see the file; for them
+the TTL, capped at MAX_TTL, bounds how long a stale entry can live.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from models import db, User
+
+
+class UserSnapshot(UserMixin):
+    """The user fields needed to serve a request, detached from any session"""
+    __slots__ = ('id', 'username', 'email')
+
+    def __init__(self, id, username, email):
+        self.id = id
+        self.username = username
+        self.email = email
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.username}>'
+
+
+# Upper bound on USER_CACHE_TTL: how stale an entry can get where the signal file does not reach
+MAX_TTL = 60
+
+
+class UserCache:
+    def __init__(self, ttl=30, max_entries=4096, signal_file=None):
+        self.ttl = min(ttl, MAX_TTL)
+        self.max_entries = max_entries
+        self.signal_file = signal_file
+        self.hits = 0
+        self.db_lookups = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._signal_seen = None
+
+    def init_app(self, app):
+        self.ttl = min(app.config.get('USER_CACHE_TTL', 30), MAX_TTL)
+        self.max_entries = app.config.get('USER_CACHE_MAX_ENTRIES', 4096)
+        self.signal_file = app.config.get('USER_CACHE_SIGNAL_FILE')
+        self.clear()
+        self._signal_seen = self._signal_mtime()
+
+    def _signal_mtime(self):
+        if not self.signal_file:
+            return None
+        try:
+            return os.stat(self.signal_file).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def signal(self):
+        """Tell every worker sharing the signal file to drop its cached users"""
+        if not self.signal_file:
+            return
+        try:
+            with open(self.signal_file, 'a'):
+                pass
+            # An explicit nanosecond timestamp: two signals within one filesystem clock tick still differ
+            now = time.time_ns()
+            os.utime(self.signal_file, ns=(now, now))
+        except OSError:
+            # Other workers then fall back to the TTL, as without a signal file
+            pass
+
+    def get(self, user_id):
+        """Return a UserSnapshot for user_id, or None if no such user exists"""
+        now = time.monotonic()
+        signal_mtime = self._signal_mtime()
+        with self._lock:
+            if signal_mtime != self._signal_seen:
+                # Another worker changed or deleted a user since we last looked
+                self._entries.clear()
+                self._signal_seen = signal_mtime
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+
+        row = db.session.execute(
+            db.select(User.id, User.username, User.email).where(User.id == user_id)
+        ).first()
+
+        with self._lock:
+            self.db_lookups += 1
+            if row is None:
+                self._entries.pop(user_id, None)
+                return None
+            snapshot = UserSnapshot(*row)
+            if self.max_entries > 0:
+                self._entries[user_id] = (now + self.ttl, snapshot)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return snapshot
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'db_lookups': self.db_lookups,
+            'saved_lookups': self.hits,
+        }
+
+
+user_cache = UserCache()
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('invalidated_users', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_bulk_delete')
+def _invalidate_bulk_delete(delete_context):
+    # Bulk deletes do not say which rows went away; drop everything to be safe
+    if delete_context.mapper.class_ is User:
+        user_cache.clear()
+        delete_context.session.info.setdefault('invalidated_users', set()).add(None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _signal_committed_changes(session):
+    invalidated = session.info.pop('invalidated_users', None)
+    if not invalidated:
+        return
+    # Another thread may have cached the old row between the flush and the commit
+    if None in invalidated:
+        user_cache.clear()
+    for user_id in invalidated - {None}:
+        user_cache.invalidate(user_id)
+    user_cache.signal()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_changes(session):
+    session.info.pop('invalidated_users', None)
@@ -2,8 +2,11 @@ import os
 import sys
 
 from app import app
+from assets import static_assets
+from compression import CompressionMiddleware
 
-from models import db, User, Transaction, Category
+from models import db
+import migrations
 
 def init_db():
     """Initialize database tables if DATABASE_URL is set"""
@@ -24,14 +27,10 @@ def init_db():
     try:
         with app.app_context():
             
-            tables = list(db.metadata.tables.keys())
-            print(f"Tables to create: {', '.join(tables)}")
+            # A single version query when the schema is current; DDL only when it is not
+            applied = migrations.ensure_schema(db.engine)
 
-
-            db.create_all()
-
-
-            print(f"✓ Successfully created {len(tables)} tables!")
+            print(f"✓ Schema is at version {migrations.head_version()} ({len(applied)} migration(s) applied)")
             print("=" * 60)
             return True
 
@@ -49,7 +48,25 @@ def init_db():
         return False
 
 
+def report_assets():
+    """The asset build is a deploy step (see Procfile); only report what it left behind"""
+    if static_assets.manifest:
+        print(f"✓ Serving {len(static_assets.manifest)} hashed static asset(s)")
+    else:
+        # Unhashed files still work, they are just revalidated on every page view
+        print("WARNING: No static asset build found; run 'flask --app app assets build'. Serving them unhashed.")
+
+
 init_db()
+report_assets()
+
+# Compress responses on their way out of the app, chunk by chunk
+app.wsgi_app = CompressionMiddleware(
+    app.wsgi_app,
+    level=app.config['COMPRESSION_LEVEL'],
+    brotli_quality=app.config['BROTLI_QUALITY'],
+    min_size=app.config['COMPRESSION_MIN_BYTES'],
+)
 
 
 if __name__ == "__main__":